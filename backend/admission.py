@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Admission config
+# -------------------------------
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "500"))  # alerts/sec per source
+ADMISSION_BURST = int(os.getenv("ADMISSION_BURST", "5000"))
+ADMISSION_MAX_WAIT_MS = int(os.getenv("ADMISSION_MAX_WAIT_MS", "250"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+ADMISSION_MAX_SOURCES = int(os.getenv("ADMISSION_MAX_SOURCES", "10000"))
+ADMISSION_SOURCE_HEADER = os.getenv("ADMISSION_SOURCE_HEADER", "X-Notifier-Source")
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec, holding at most `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, n):
+        """Take n tokens. Returns 0 on success, else seconds until n are available."""
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0
+        return (n - self.tokens) / self.rate
+
+    def refund(self, n):
+        self.tokens = min(self.burst, self.tokens + n)
+
+
+class AdmissionController:
+    """
+    Decides whether a webhook payload may enter the ingest queue.
+
+    Two checks run in order:
+      1. a per-source token bucket (429 + Retry-After when empty), so one
+         noisy notifier cannot starve the others;
+      2. queue capacity. If the queue has no room for the payload we wait up
+         to `max_wait` seconds for the writers to catch up (counted as
+         deferred), then shed it with 503 + Retry-After.
+    Every admitted, deferred and shed alert is counted.
+    """
+
+    def __init__(
+        self,
+        queue,
+        rate=ADMISSION_RATE,
+        burst=ADMISSION_BURST,
+        max_wait=ADMISSION_MAX_WAIT_MS / 1000,
+        retry_after=ADMISSION_RETRY_AFTER,
+        max_sources=ADMISSION_MAX_SOURCES,
+    ):
+        self.queue = queue
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.max_sources = max_sources
+        self._buckets = OrderedDict()
+        self.counters = {
+            "admitted": 0,
+            "deferred": 0,
+            "shed_rate_limited": 0,
+            "shed_queue_full": 0,
+            "shed_too_large": 0,
+        }
+        self.shed_by_source = {}
+
+    def source_of(self, request):
+        """Identify the notifier: explicit header first, client address otherwise."""
+        source = request.headers.get(ADMISSION_SOURCE_HEADER)
+        if not source and request.client:
+            source = request.client.host
+        return source or "unknown"
+
+    def _bucket(self, source):
+        bucket = self._buckets.get(source)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[source] = bucket
+            if len(self._buckets) > self.max_sources:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(source)
+        return bucket
+
+    def _shed(self, source, n, counter, status_code, retry_after, detail):
+        self.counters[counter] += n
+        if source in self.shed_by_source or len(self.shed_by_source) < self.max_sources:
+            self.shed_by_source[source] = self.shed_by_source.get(source, 0) + n
+        logger.warning(f"🚫 Shed {n} alerts from {source}: {detail}")
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def _free(self):
+        return self.queue.maxsize - self.queue.depth()
+
+    async def admit(self, source, rows):
+        """Put rows on the ingest queue or raise 413/429/503."""
+        n = len(rows)
+        if n == 0:
+            return
+        if n > self.burst or n > self.queue.maxsize:
+            self._shed(source, n, "shed_too_large", 413, self.retry_after,
+                       f"Payload of {n} alerts exceeds the per-request limit")
+
+        bucket = self._bucket(source)
+        wait = bucket.take(n)
+        if wait:
+            self._shed(source, n, "shed_rate_limited", 429, wait,
+                       "Alert rate limit exceeded for this source")
+
+        if self._free() < n:
+            self.counters["deferred"] += n
+            deadline = time.monotonic() + self.max_wait
+            while self._free() < n and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            if self._free() < n:
+                bucket.refund(n)
+                self._shed(source, n, "shed_queue_full", 503, self.retry_after,
+                           "Ingest queue is saturated, retry later")
+
+        # Room is guaranteed here: nothing awaits between the check and the puts
+        self.queue.put_nowait_many(rows)
+        self.counters["admitted"] += n
+
+    def stats(self):
+        return {
+            **self.counters,
+            "sources": len(self._buckets),
+            "shed_by_source": dict(
+                sorted(self.shed_by_source.items(), key=lambda kv: kv[1], reverse=True)[:20]
+            ),
+        }
@@ -0,0 +1,314 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from storage.base import ALERT_COLUMNS
+from sync_cursor import normalize_ts, parse_ts
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # optional: the archive tier is disabled without pyarrow
+    pa = pc = pq = None
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Archive config
+# -------------------------------
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "0") == "1"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "data/archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "5000"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Low-cardinality columns stored (and read back) dictionary-encoded
+DICTIONARY_COLUMNS = ["event", "severity", "source_ip", "country", "city"]
+# Non-string columns; parts written before a column existed read it as null
+COLUMN_TYPES = {
+    "latitude": pa.float64(),
+    "longitude": pa.float64(),
+    "asn": pa.int64(),
+} if pa else {}
+
+
+def _iso_z(ts):
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _day_of(value):
+    ts = parse_ts(value)
+    return ts.date().isoformat() if ts else str(value)[:10]
+
+
+class AlertArchive:
+    """
+    Cold tier for old alerts: Parquet files partitioned per day under
+    ARCHIVE_DIR/date=YYYY-MM-DD/, with event/severity/source_ip
+    dictionary-encoded.
+
+    tier() moves rows older than ARCHIVE_AFTER_DAYS out of the primary
+    store; scan() answers the same keyset page queries as the store, so
+    AlertStore can merge both tiers. Only the day partitions overlapping the
+    requested time range (and cursor) are opened.
+
+    A crash between writing a part file and deleting its rows from the store
+    can leave a row in both tiers; AlertStore drops such repeats by id.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR, after_days=ARCHIVE_AFTER_DAYS, batch=ARCHIVE_BATCH):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for the alert archive (pip install pyarrow)")
+        self.root = root
+        self.after_days = after_days
+        self.batch = batch
+        self.schema = pa.schema([(c, COLUMN_TYPES.get(c, pa.string())) for c in ALERT_COLUMNS])
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._days = sorted(
+            name.split("=", 1)[1] for name in os.listdir(root) if name.startswith("date=")
+        )
+
+    # -------------------------------
+    # Partitions
+    # -------------------------------
+    def days(self):
+        with self._lock:
+            return list(self._days)
+
+    def horizon(self):
+        """ISO timestamp past the newest archived day; nothing archived is newer."""
+        days = self.days()
+        if not days:
+            return None
+        newest = datetime.fromisoformat(days[-1]).replace(tzinfo=timezone.utc)
+        return _iso_z(newest + timedelta(days=1))
+
+    def _day_dir(self, day):
+        return os.path.join(self.root, f"date={day}")
+
+    def _prune(self, since=None, until=None, cursor=None, descending=True):
+        """Day partitions that can hold rows in [since, until) beyond the cursor."""
+        lo = _day_of(since) if since else None
+        hi = _day_of(until) if until else None
+        if cursor:
+            if descending:
+                hi = min(hi, _day_of(cursor[0])) if hi else _day_of(cursor[0])
+            else:
+                lo = max(lo, _day_of(cursor[0])) if lo else _day_of(cursor[0])
+        days = [d for d in self.days() if (lo is None or d >= lo) and (hi is None or d <= hi)]
+        return list(reversed(days)) if descending else days
+
+    def _expression(self, filters, cursor=None, descending=True):
+        """The store's page filters (and keyset cursor) as a pyarrow filter, pushed into the scan."""
+        field = pc.field
+        parts = []
+        if filters.get("severity"):
+            parts.append(field("severity").isin(list(filters["severity"])))
+        if filters.get("exclude_severity"):
+            parts.append(~field("severity").isin(list(filters["exclude_severity"])))
+        if filters.get("source_ip"):
+            parts.append(field("source_ip") == filters["source_ip"])
+        event = filters.get("event")
+        if event:
+            if "*" in event:
+                # Same semantics as the SQLite backend's LIKE: case-insensitive
+                parts.append(pc.match_like(field("event"), event.replace("*", "%"), ignore_case=True))
+            else:
+                parts.append(field("event") == event)
+        if filters.get("since"):
+            parts.append(field("timestamp") >= normalize_ts(filters["since"]))
+        if filters.get("until"):
+            parts.append(field("timestamp") < normalize_ts(filters["until"]))
+        if cursor:
+            ts, alert_id = normalize_ts(cursor[0]), cursor[1]
+            if descending:
+                parts.append((field("timestamp") < ts) | ((field("timestamp") == ts) & (field("id") < alert_id)))
+            else:
+                parts.append((field("timestamp") > ts) | ((field("timestamp") == ts) & (field("id") > alert_id)))
+        expression = None
+        for part in parts:
+            expression = part if expression is None else expression & part
+        return expression
+
+    def _read_day(self, day, columns, expression=None):
+        """Table of `columns` from one day partition, only the rows matching `expression`."""
+        try:
+            return pq.read_table(
+                self._day_dir(day),
+                columns=columns,
+                schema=self.schema,
+                filters=expression,
+                read_dictionary=[c for c in DICTIONARY_COLUMNS if c in columns],
+            )
+        except FileNotFoundError:
+            return None
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+    def write(self, rows):
+        """Append rows as one new part file per day (temp file + rename)."""
+        by_day = defaultdict(list)
+        for row in rows:
+            row = {c: row.get(c) for c in ALERT_COLUMNS}
+            row["timestamp"] = normalize_ts(row["timestamp"])
+            by_day[_day_of(row["timestamp"])].append(row)
+
+        for day, day_rows in by_day.items():
+            day_rows.sort(key=lambda r: (r["timestamp"] or "", r["id"] or ""))
+            table = pa.Table.from_pylist(day_rows, schema=self.schema)
+            directory = self._day_dir(day)
+            os.makedirs(directory, exist_ok=True)
+            name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+            tmp = os.path.join(directory, f".{name}.tmp")
+            pq.write_table(table, tmp, use_dictionary=DICTIONARY_COLUMNS, compression="zstd")
+            os.replace(tmp, os.path.join(directory, name))
+            with self._lock:
+                if day not in self._days:
+                    self._days.append(day)
+                    self._days.sort()
+
+    def tier(self, store, now=None):
+        """Move alerts older than `after_days` from the primary store into the archive."""
+        started = time.monotonic()
+        now = now or datetime.now(timezone.utc)
+        cutoff = _iso_z(now - timedelta(days=self.after_days))
+        moved = 0
+        while True:
+            # Oldest first, straight from the backend (not the merged view)
+            rows = store.page(list(ALERT_COLUMNS), {"until": cutoff}, None, False,
+                              self.batch, include_archive=False)
+            if not rows:
+                break
+            self.write(rows)
+            store.delete([r["id"] for r in rows])
+            moved += len(rows)
+            if len(rows) < self.batch:
+                break
+        return {"moved": moved, "cutoff": cutoff, "seconds": round(time.monotonic() - started, 3)}
+
+    def expire(self, cutoffs, default_cutoff):
+        """
+        Remove archived rows past their retention: `cutoffs` maps severity ->
+        ISO timestamp (rows older expire), `default_cutoff` covers every other
+        severity. A day with expired rows is rewritten as one part without
+        them (the rollups already hold their counts); a day past every cutoff
+        is removed whole. Returns Counter of severity -> rows removed.
+        """
+        field = pc.field
+        listed = list(cutoffs)
+        bounds = {s: normalize_ts(c) for s, c in cutoffs.items()}
+        default = normalize_ts(default_cutoff)
+        expired = ~field("severity").isin(listed) & (field("timestamp") < default)
+        for severity, cutoff in bounds.items():
+            expired = expired | ((field("severity") == severity) & (field("timestamp") < cutoff))
+        # Rows without a timestamp are never expired by age
+        expired = field("timestamp").is_valid() & expired
+
+        removed = Counter()
+        newest = max([default, *bounds.values()])
+        oldest = min([default, *bounds.values()])
+        for day in self.days():
+            if day > newest[:10]:
+                break
+            directory = self._day_dir(day)
+            parts = [os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(".parquet")]
+            day_end = _iso_z(datetime.fromisoformat(day).replace(tzinfo=timezone.utc) + timedelta(days=1))
+            if day_end <= oldest:
+                # Every row is past every cutoff
+                table = self._read_day(day, ["severity"])
+                if table is not None:
+                    removed.update(table.column("severity").to_pylist())
+                shutil.rmtree(directory, ignore_errors=True)
+                with self._lock:
+                    self._days.remove(day)
+                continue
+            gone = self._read_day(day, ["severity", "timestamp"], expired)
+            if gone is None or gone.num_rows == 0:
+                continue
+            removed.update(gone.column("severity").to_pylist())
+            self._replace_day(day, parts, self._read_day(day, list(ALERT_COLUMNS)).filter(~expired))
+        return removed
+
+    def reclassify(self, resolve):
+        """
+        Rewrite archived severities with `resolve(event, severity)` (one-off
+        backfills); only days where a value changes are rewritten. Returns
+        how many rows changed.
+        """
+        changed = 0
+        for day in self.days():
+            directory = self._day_dir(day)
+            parts = [os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(".parquet")]
+            table = self._read_day(day, list(ALERT_COLUMNS))
+            if table is None:
+                continue
+            table = table.cast(self.schema)
+            old = table.column("severity").to_pylist()
+            new = [resolve(e, s) for e, s in zip(table.column("event").to_pylist(), old)]
+            n = sum(a != b for a, b in zip(old, new))
+            if n:
+                i = table.schema.get_field_index("severity")
+                self._replace_day(day, parts, table.set_column(i, "severity", pa.array(new, pa.string())))
+                changed += n
+        return changed
+
+    def _replace_day(self, day, parts, table):
+        """Swap a day's `parts` for one part holding `table` (removing the day when empty)."""
+        directory = self._day_dir(day)
+        if table.num_rows:
+            table = table.sort_by([("timestamp", "ascending"), ("id", "ascending")]).cast(self.schema)
+            name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+            tmp = os.path.join(directory, f".{name}.tmp")
+            pq.write_table(table, tmp, use_dictionary=DICTIONARY_COLUMNS, compression="zstd")
+            os.replace(tmp, os.path.join(directory, name))
+        for part in parts:
+            os.remove(part)
+        if not table.num_rows:
+            shutil.rmtree(directory, ignore_errors=True)
+            with self._lock:
+                self._days.remove(day)
+
+    def drop_before(self, day):
+        """Delete whole day partitions older than `day` (YYYY-MM-DD); returns how many."""
+        dropped = [d for d in self.days() if d < day]
+        for d in dropped:
+            shutil.rmtree(self._day_dir(d), ignore_errors=True)
+            with self._lock:
+                self._days.remove(d)
+        return len(dropped)
+
+    # -------------------------------
+    # Reads
+    # -------------------------------
+    def scan(self, columns, filters, cursor, descending, limit):
+        """
+        Same contract as StorageBackend.fetch_alerts_page, over the archive.
+
+        Filters and cursor are pushed into the Parquet scan. Per day only
+        the (timestamp, id) keys of matching rows are read to pick the page;
+        the requested columns are then read for those ids alone, and no more
+        days are opened once `limit` rows are found.
+        """
+        expression = self._expression(filters, cursor, descending)
+        order = "descending" if descending else "ascending"
+        found = []
+        for day in self._prune(filters.get("since"), filters.get("until"), cursor, descending):
+            keys = self._read_day(day, ["timestamp", "id"], expression)
+            if keys is None or keys.num_rows == 0:
+                continue
+            keys = keys.sort_by([("timestamp", order), ("id", order)]).slice(0, limit - len(found))
+            ids = keys.column("id")
+            table = self._read_day(day, sorted(set(columns) | {"id", "timestamp"}), pc.field("id").isin(ids))
+            rows = table.sort_by([("timestamp", order), ("id", order)]).to_pylist()
+            found.extend({c: r.get(c) for c in columns} for r in rows)
+            if len(found) >= limit:
+                break
+        return found[:limit]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+One-off: count alerts stored before the rollups existed.
+
+The app records a marker on its first start: the newest alert stored
+before it counted anything live (see rollups.backfill_mark).
+This reads every stored alert up to that marker (primary store and
+archive) and adds it to the rollups and the lifetime totals, whatever
+buckets the app has filled live since, and adds them to the all-time
+top source IPs of the heavy-hitter snapshot. Minute and hour buckets
+past their retention are skipped (pruning would drop them). The marker
+is set done with the last batch, so a second run adds nothing.
+
+Run it with the app stopped: the app flushes rollups and rewrites the
+heavy-hitter snapshot itself.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from archive import ARCHIVE_ENABLED, AlertArchive
+from classifier import get_classifier
+from heavy_hitters import HeavyHitters
+from rollups import BACKFILL, AlertRollups, _iso_z, backfill_mark, count_rows
+from storage import create_stores
+from sync_cursor import normalize_ts
+
+BACKFILL_PAGE = 5000
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger("backfill-rollups")
+
+
+def stored_pages(store, until):
+    """Every stored alert up to the (timestamp, id) `until`, oldest first, a page at a time."""
+    cursor = None
+    while True:
+        rows = store.page(["id", "event", "severity", "source_ip", "timestamp"], {}, cursor, False, BACKFILL_PAGE)
+        last = len(rows) < BACKFILL_PAGE
+        if rows:
+            cursor = (rows[-1]["timestamp"], rows[-1]["id"])
+        rows = [r for r in rows if (normalize_ts(r["timestamp"]), str(r["id"])) <= until]
+        if rows:
+            yield rows
+        if last or len(rows) < BACKFILL_PAGE:
+            return
+
+
+def main():
+    store, _ = create_stores(archive=AlertArchive() if ARCHIVE_ENABLED else None)
+    # Only for the per-resolution retention
+    retention = AlertRollups(store).retention
+    mark = backfill_mark(store)
+    if mark["count"]:
+        logger.info("Nothing to backfill: the rollups already count every stored alert")
+        store.close()
+        return
+
+    classifier = get_classifier()
+    heavy_hitters = HeavyHitters()
+    heavy_hitters.load()
+
+    pending, counted = Counter(), 0
+    for rows in stored_pages(store, (normalize_ts(mark["bucket"]), mark["event"])):
+        # Count legacy rows under the severity they are classified as today
+        rows = [{**r, "severity": classifier.resolve(r["event"], r["severity"])} for r in rows]
+        pending.update(count_rows(rows))
+        heavy_hitters.update(rows)
+        counted += len(rows)
+
+    # Skip buckets already past their resolution's retention
+    now = datetime.now(timezone.utc)
+    oldest = {
+        name: _iso_z(int((now - timedelta(seconds=kept)).timestamp()))
+        for name, kept in retention.items() if kept
+    }
+    rows = [
+        {"resolution": r, "bucket": b, "event": e, "severity": s, "count": c}
+        for (r, b, e, s), c in pending.items()
+        if r not in oldest or b >= oldest[r]
+    ]
+    # Last, so the marker is only set once every count is in
+    rows.append({"resolution": BACKFILL, "bucket": mark["bucket"], "event": mark["event"], "severity": "", "count": 1})
+    for start in range(0, len(rows), BACKFILL_PAGE):
+        store.add_rollups(rows[start:start + BACKFILL_PAGE])
+    heavy_hitters.snapshot()
+    logger.info(f"Backfilled {len(rows) - 1} rollup rows and the all-time top source IPs from {counted} stored alerts")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+One-off: classify alerts stored before severities were classified at ingest.
+
+Those rows carry the old "info" default (or a lower-case label); every
+stored alert, in the primary store and the archive, gets the severity the
+ingest path would give it today (SeverityClassifier.resolve), so the
+`severity=` filters and the colours match old and new alerts alike. The
+dashboard shows the stored value as is, so run it once after upgrading;
+new rows are resolved as they are written (AlertStore.insert). Running it
+again changes nothing. Run it before backfill_rollups.py.
+"""
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from archive import ARCHIVE_ENABLED, AlertArchive
+from classifier import get_classifier
+from storage import create_stores
+
+BACKFILL_PAGE = 5000
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger("backfill-severity")
+
+
+def main():
+    archive = AlertArchive() if ARCHIVE_ENABLED else None
+    store, _ = create_stores(archive=archive)
+    classifier = get_classifier()
+
+    cursor, changed, seen = None, 0, 0
+    while True:
+        rows = store.page(["id", "event", "severity", "timestamp"], {}, cursor, False, BACKFILL_PAGE,
+                          include_archive=False)
+        updates = []
+        for row in rows:
+            severity = classifier.resolve(row["event"], row["severity"])
+            if severity != row["severity"]:
+                updates.append({"id": row["id"], "severity": severity})
+        store.set_severities(updates)
+        changed += len(updates)
+        seen += len(rows)
+        if len(rows) < BACKFILL_PAGE:
+            break
+        cursor = (rows[-1]["timestamp"], rows[-1]["id"])
+    logger.info(f"Reclassified {changed} of {seen} stored alerts")
+
+    if archive is not None:
+        archived = archive.reclassify(classifier.resolve)
+        logger.info(f"Reclassified {archived} archived alerts")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
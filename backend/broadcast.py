@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Stream config
+# -------------------------------
+# Ingest batches (not rows) a client may fall behind by before it is evicted
+STREAM_CLIENT_BUFFER = int(os.getenv("STREAM_CLIENT_BUFFER", "256"))
+STREAM_MAX_CLIENTS = int(os.getenv("STREAM_MAX_CLIENTS", "500"))
+
+# Marks the end of a subscription's stream (evicted or hub closed)
+EVICTED = None
+
+
+class HubFull(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, buffer):
+        self.queue = asyncio.Queue(maxsize=buffer)
+        self.evicted = False
+
+    async def get(self):
+        """Next batch of alert rows, or EVICTED once the hub has dropped this client."""
+        return await self.queue.get()
+
+
+class BroadcastHub:
+    """
+    In-process fan-out of newly stored alerts to live dashboard streams.
+
+    Each client gets its own bounded buffer of batches: one ingest batch,
+    however many rows it holds, takes one slot. publish() never waits: a client
+    whose buffer is full is a slow consumer and is evicted (its buffer is
+    replaced by an EVICTED marker), so one stalled browser cannot hold back
+    the ingest path or the other clients.
+    """
+
+    def __init__(self, buffer=STREAM_CLIENT_BUFFER, max_clients=STREAM_MAX_CLIENTS):
+        self.buffer = buffer
+        self.max_clients = max_clients
+        self._clients = set()
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self):
+        if len(self._clients) >= self.max_clients:
+            raise HubFull(f"{self.max_clients} stream clients already connected")
+        sub = Subscription(self.buffer)
+        self._clients.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self._clients.discard(sub)
+
+    def _evict(self, sub):
+        self._clients.discard(sub)
+        sub.evicted = True
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(EVICTED)
+        self.evictions += 1
+        logger.warning("🐌 Evicted slow alert stream client")
+
+    def publish(self, rows):
+        """Ingest listener: queue the batch of rows for every connected client."""
+        if not rows:
+            return
+        self.published += len(rows)
+        batch = list(rows)
+        for sub in list(self._clients):
+            try:
+                sub.queue.put_nowait(batch)
+            except asyncio.QueueFull:
+                self._evict(sub)
+
+    def close(self):
+        for sub in list(self._clients):
+            self._clients.discard(sub)
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(EVICTED)
+
+    def stats(self):
+        return {
+            "clients": len(self._clients),
+            "max_clients": self.max_clients,
+            "buffer": self.buffer,
+            "published": self.published,
+            "evictions": self.evictions,
+        }
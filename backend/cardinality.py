@@ -0,0 +1,152 @@
+import base64
+import hashlib
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sync_cursor import parse_ts
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Cardinality config
+# -------------------------------
+# 2^p registers per sketch; standard error is about 1.04 / sqrt(2^p) (1.6% at 12)
+HLL_PRECISION = int(os.getenv("HLL_PRECISION", "12"))
+HLL_FLUSH_SECONDS = int(os.getenv("HLL_FLUSH_SECONDS", "30"))
+HLL_RETENTION_DAYS = int(os.getenv("HLL_RETENTION_DAYS", "90"))
+
+# Scenario key of the global (all scenarios) sketch
+ALL_SCENARIOS = "*"
+
+
+class HyperLogLog:
+    """Distinct-count sketch in 2^p one-byte registers; merge is a register-wise max."""
+
+    def __init__(self, p=HLL_PRECISION, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        idx = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge HLL p={other.p} into p={self.p}")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is more accurate
+            return round(m * math.log(m / zeros))
+        return round(estimate)
+
+    def to_text(self):
+        return base64.b64encode(bytes(self.registers)).decode()
+
+    @classmethod
+    def from_text(cls, text):
+        registers = bytearray(base64.b64decode(text))
+        return cls(p=len(registers).bit_length() - 1, registers=registers)
+
+
+def _hour_of(ts):
+    return ts.strftime("%Y-%m-%dT%H:00:00Z")
+
+
+class DistinctAttackers:
+    """
+    Approximate distinct source IPs per (scenario, hour), plus a global
+    sketch per hour under scenario "*", kept in the store's alert_sketches
+    table.
+
+    update() is an ingest listener and only touches in-memory sketches for
+    the hours it sees. flush() (scheduled every HLL_FLUSH_SECONDS) sends
+    the changed ones to the store, which max-merges them into the stored
+    rows in one atomic upsert: several worker processes flushing the same
+    hour never overwrite each other's registers, and a retried flush never
+    inflates a count. A range query merges one sketch
+    per hour into a single one, so memory stays constant however long the
+    range.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._sketches = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def update(self, rows):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for row in rows:
+                ip = row.get("source_ip")
+                if not ip:
+                    continue
+                hour = _hour_of(parse_ts(row.get("timestamp")) or now)
+                for event in (row.get("event") or "unknown", ALL_SCENARIOS):
+                    key = (hour, event)
+                    sketch = self._sketches.get(key)
+                    if sketch is None:
+                        sketch = self._sketches[key] = HyperLogLog()
+                    sketch.add(ip)
+                    self._dirty.add(key)
+
+    def flush(self):
+        """Merge changed sketches into the store (blocking)."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            pending = {key: HyperLogLog(registers=bytearray(self._sketches[key].registers))
+                       for key in dirty}
+        if not pending:
+            return {"flushed": 0}
+        try:
+            self.store.merge_sketches([
+                {"hour": hour, "event": event, "registers": sketch.to_text()}
+                for (hour, event), sketch in pending.items()
+            ])
+        except Exception:
+            with self._lock:
+                self._dirty |= dirty
+            raise
+
+        # Hours that stopped changing are served from the store from now on
+        current = _hour_of(datetime.now(timezone.utc) - timedelta(hours=1))
+        with self._lock:
+            for key in [k for k in self._sketches if k[0] < current and k not in self._dirty]:
+                del self._sketches[key]
+        return {"flushed": len(pending)}
+
+    def prune(self):
+        """Drop stored sketches older than HLL_RETENTION_DAYS (blocking)."""
+        before = _hour_of(datetime.now(timezone.utc) - timedelta(days=HLL_RETENTION_DAYS))
+        return {"removed": self.store.delete_sketches(before)}
+
+    def distinct(self, since, until, event=None):
+        """Approximate distinct source IPs in [since, until) (datetimes), hour-aligned. Blocking."""
+        event = event or ALL_SCENARIOS
+        lo = _hour_of(since)
+        hi = _hour_of(until - timedelta(microseconds=1) + timedelta(hours=1))
+        merged = HyperLogLog()
+        hours = set()
+        for row in self.store.sketches(lo, hi, [event]):
+            merged.merge(HyperLogLog.from_text(row["registers"]))
+            hours.add(row["hour"])
+        with self._lock:
+            for (hour, e), sketch in self._sketches.items():
+                if e == event and lo <= hour < hi:
+                    merged.merge(sketch)
+                    hours.add(hour)
+        return {"distinct": merged.count(), "hours": len(hours), "since": lo, "until": hi}
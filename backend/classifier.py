@@ -0,0 +1,131 @@
+import fnmatch
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Classifier config
+# -------------------------------
+# JSON list of {"pattern": ..., "severity": ...}; the built-in rules apply when unset
+SEVERITY_RULES_FILE = os.getenv("SEVERITY_RULES_FILE", "")
+SEVERITY_DEFAULT = os.getenv("SEVERITY_DEFAULT", "Low")
+SEVERITY_CACHE_SIZE = int(os.getenv("SEVERITY_CACHE_SIZE", "4096"))
+
+# What both ingest paths stored before alerts were classified
+LEGACY_SEVERITY = "Info"
+
+# Same labels and precedence the dashboard used to compute client-side
+DEFAULT_RULES = [
+    ("ssh", "Critical"),
+    ("bruteforce", "Critical"),
+    ("ddos", "Ddos"),
+    ("dos", "Ddos"),
+    ("scan", "High"),
+    ("exploit", "High"),
+    ("suspicious", "Medium"),
+]
+
+
+def normalize_severity(value):
+    """One spelling per label (" high", "HIGH" -> "High"); None when empty."""
+    value = str(value or "").strip()
+    return value.capitalize() if value else None
+
+
+def parse_severities(value):
+    """A `severity=` filter ("high,Critical") as stored labels; None when empty."""
+    labels = [normalize_severity(s) for s in str(value or "").split(",")]
+    return [s for s in labels if s] or None
+
+
+def _pattern_regex(pattern):
+    """
+    Regex for one rule, matched from the start of the scenario:
+      re:<regex>   regular expression, searched anywhere
+      a glob       `*` / `?` wildcards, matched against the whole scenario
+      anything else  a keyword, matched anywhere
+    """
+    if pattern.startswith("re:"):
+        return f".*?(?:{pattern[3:]})"
+    if "*" in pattern or "?" in pattern:
+        return fnmatch.translate(pattern)
+    return f".*?{re.escape(pattern)}"
+
+
+class SeverityClassifier:
+    """
+    Maps scenario names to severities. All rules are compiled into a single
+    case-insensitive regex: one lookahead alternative per rule, tried in
+    rule order at position 0, so the first matching rule wins and the
+    matched group names it. Results are cached per distinct scenario, so
+    the regex runs once per scenario, not once per alert.
+    """
+
+    def __init__(self, rules=None, default=SEVERITY_DEFAULT, cache_size=SEVERITY_CACHE_SIZE):
+        self.rules = [(p, normalize_severity(s)) for p, s in (rules if rules is not None else DEFAULT_RULES)]
+        self.default = normalize_severity(default)
+        alternatives = []
+        for i, (pattern, _) in enumerate(self.rules):
+            regex = _pattern_regex(pattern)
+            try:
+                re.compile(regex)
+            except re.error as e:
+                raise ValueError(f"Invalid severity rule {pattern!r}: {e}")
+            alternatives.append(f"(?=(?:{regex}))(?P<r{i}>)")
+        self._matcher = None
+        if alternatives:
+            try:
+                self._matcher = re.compile("|".join(alternatives), re.IGNORECASE | re.DOTALL)
+            except re.error as e:
+                raise ValueError(f"Severity rules do not combine: {e}")
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def resolve(self, scenario, severity=None):
+        """
+        Severity to store for an alert: an explicit one wins, case-normalised,
+        unless it is empty or the legacy "info" default; then the scenario's.
+        """
+        label = normalize_severity(severity)
+        if label is None or label == LEGACY_SEVERITY:
+            return self.classify(scenario)
+        return label
+
+    def _classify(self, scenario):
+        if self._matcher is None or not scenario:
+            return self.default
+        m = self._matcher.match(scenario)
+        if m is None:
+            return self.default
+        return self.rules[int(m.lastgroup[1:])][1]
+
+
+def load_rules(path):
+    with open(path) as f:
+        data = json.load(f)
+    return [(r["pattern"], r["severity"]) for r in data]
+
+
+_classifier = None
+
+
+def get_classifier():
+    """Process-wide classifier; falls back to the built-in rules if the rules file is unusable."""
+    global _classifier
+    if _classifier is None:
+        rules = None
+        if SEVERITY_RULES_FILE:
+            try:
+                rules = load_rules(SEVERITY_RULES_FILE)
+                logger.info(f"🏷 Loaded {len(rules)} severity rules from {SEVERITY_RULES_FILE}")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f"❌ Severity rules {SEVERITY_RULES_FILE} not loaded, using defaults: {e}")
+        try:
+            _classifier = SeverityClassifier(rules)
+        except ValueError as e:
+            logger.error(f"❌ {e}; using the default severity rules")
+            _classifier = SeverityClassifier()
+    return _classifier
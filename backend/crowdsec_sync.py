@@ -1,27 +1,37 @@
+import asyncio
 import os
-import time
-from datetime import datetime
-from supabase import create_client
-import requests
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
 import uuid
 
+from classifier import get_classifier
+from dedup import DedupCache
+from geoip import get_geoip
+from ingest import add_listener, publish_written, remove_listener
+from lapi_auth import get_lapi_auth
+from lapi_client import close_lapi_client
+from rollups import ROLLUP_FLUSH_SECONDS, AlertRollups, warn_if_not_backfilled
+from rule_engine import get_rule_engine, insert_alerts
+from storage import create_stores
+from sync_cursor import SyncCursor, lapi_duration, parse_ts
+
 # -------------------------------
 # Load environment variables
 # -------------------------------
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-CROWDSEC_API_URL = os.getenv("CROWDSEC_API_URL", "http://127.0.0.1:8080")
-CROWDSEC_LOGIN = os.getenv("CROWDSEC_LOGIN")
-CROWDSEC_PASSWORD = os.getenv("CROWDSEC_PASSWORD")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise Exception("Supabase credentials missing in .env")
-
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+SYNC_POLL_INTERVAL = int(os.getenv("SYNC_POLL_INTERVAL", "5"))
+SYNC_PAGE_LIMIT = int(os.getenv("SYNC_PAGE_LIMIT", "500"))
+# Largest page asked for when more than a page of alerts share one second
+SYNC_MAX_PAGE_LIMIT = int(os.getenv("SYNC_MAX_PAGE_LIMIT", "20000"))
+# Re-read alerts created this many seconds before the cursor (LAPI commits
+# are not strictly in created_at order)
+SYNC_CURSOR_OVERLAP = int(os.getenv("SYNC_CURSOR_OVERLAP", "30"))
+# LAPI's `since` filters on when an alert's bucket started, which can be long
+# before the alert is created: keep this above the longest scenario window
+# (capacity x leakspeed, or a counter's duration)
+SYNC_SCENARIO_WINDOW = int(os.getenv("SYNC_SCENARIO_WINDOW", "86400"))
 
 # -------------------------------
 # Logging
@@ -39,38 +49,80 @@ logger = logging.getLogger("crowdsec-sync")
 # -------------------------------
 # CrowdSec functions
 # -------------------------------
-def get_lapi_token():
-    """Login to CrowdSec LAPI and get JWT token"""
+async def get_lapi_token():
+    """Login to CrowdSec LAPI (or reuse the cached JWT) and return the token"""
     try:
-        resp = requests.post(
-            f"{CROWDSEC_API_URL}/v1/watchers/login",
-            json={"machine_id": CROWDSEC_LOGIN, "password": CROWDSEC_PASSWORD},
-            timeout=5
-        )
-        resp.raise_for_status()
-        token = resp.json().get("token")
-        logger.info("✅ Authenticated with CrowdSec LAPI")
-        return token
+        return await get_lapi_auth().token()
     except Exception as e:
         logger.error(f"❌ Failed to login to LAPI: {e}")
         return None
 
-def fetch_alerts(token):
-    """Fetch alerts from CrowdSec LAPI"""
+async def fetch_alerts(since=None, created_before=None, limit=None):
+    """Fetch alerts from CrowdSec LAPI, optionally filtered by since/created_before/limit; None on failure"""
+    params = {k: v for k, v in {"since": since, "created_before": created_before, "limit": limit}.items() if v}
     try:
-        headers = {"Authorization": f"Bearer {token}"}
-        resp = requests.get(f"{CROWDSEC_API_URL}/v1/alerts", headers=headers, timeout=5)
+        resp = await get_lapi_auth().request("GET", "/v1/alerts", params=params)
         resp.raise_for_status()
-        return resp.json()
+        return resp.json() or []
     except Exception as e:
         logger.error(f"❌ Failed to fetch alerts: {e}")
-        return []
+        return None
+
+
+async def fetch_new_alerts(cursor):
+    """
+    Fetch the alerts created after the cursor (minus SYNC_CURSOR_OVERLAP).
+    LAPI returns newest created first; full pages are followed by paging
+    backwards with `created_before` at the second of the previous page's
+    oldest alert, until a page reaches back past the cursor. Pages overlap
+    on that second; the caller's dedup drops repeats. `since` (which LAPI
+    compares with started_at) only bounds the scan, widened by
+    SYNC_SCENARIO_WINDOW so alerts whose bucket started long ago still
+    match. Returns None if any page failed, so the cursor never skips
+    past a gap.
+    """
+    since, stop = None, None
+    if cursor.created_at:
+        since = lapi_duration(cursor.created_at, SYNC_CURSOR_OVERLAP + SYNC_SCENARIO_WINDOW)
+        stop = cursor.created_at - timedelta(seconds=SYNC_CURSOR_OVERLAP)
+    created_before = None
+    limit = SYNC_PAGE_LIMIT
+    oldest = None
+    collected = {}
+    while True:
+        page = await fetch_alerts(since=since, created_before=created_before, limit=limit)
+        if page is None:
+            return None
+        for alert in page:
+            collected.setdefault(alert.get("uuid") or alert.get("id") or id(alert), alert)
+        if len(page) < limit:
+            break
+        stamps = [ts for ts in (parse_ts(a.get("created_at")) for a in page) if ts]
+        if not stamps or (stop and min(stamps) < stop):
+            break
+        if oldest is not None and min(stamps) >= oldest:
+            # A full page inside one second: `created_before` cannot go finer, so ask for more
+            if limit >= SYNC_MAX_PAGE_LIMIT:
+                logger.warning(f"⚠ More than {limit} alerts within one second at {oldest.isoformat()}; "
+                               "older alerts in that second may be missed")
+                break
+            limit = min(limit * 2, SYNC_MAX_PAGE_LIMIT)
+            continue
+        oldest = min(stamps)
+        created_before = lapi_duration(oldest, round_up=False)
+    return list(collected.values())
 
 # -------------------------------
-# Supabase push
+# Store push
 # -------------------------------
-def push_to_supabase(alerts):
-    """Push new alerts to Supabase safely"""
+def push_to_store(store, alerts):
+    """
+    Push new alerts to the store in one batch; returns the rows actually
+    inserted, or None if the write failed.
+    """
+    rows = {}
+    geoip = get_geoip()
+    classifier = get_classifier()
     for alert in alerts:
         # Generate a safe UUID
         raw_id = alert.get("uuid") or alert.get("id") or str(alert.get("created_at"))
@@ -86,61 +138,115 @@ def push_to_supabase(alerts):
         source = alert.get("source")
         source_ip = source.get("ip") if isinstance(source, dict) else "unknown"
 
-        # Severity
-        severity = "info"
+        # Severity: an explicit meta severity wins, otherwise classify the scenario
+        severity = None
         meta = alert.get("meta")
         if isinstance(meta, dict):
-            severity = meta.get("severity") or "info"
+            severity = meta.get("severity")
         elif isinstance(meta, list):
             for item in meta:
                 if isinstance(item, dict) and "severity" in item:
-                    severity = item.get("severity") or "info"
+                    severity = item.get("severity")
                     break
+        severity = classifier.resolve(event, severity)
 
         # Timestamp
         timestamp = alert.get("created_at") or datetime.utcnow().isoformat() + "Z"
 
-        # Skip if exists
-        try:
-            existing = supabase.table("alerts").select("*").eq("id", alert_id).execute()
-            if existing.data:
-                continue
-        except Exception as e:
-            logger.warning(f"⚠ Failed to check existing alert {alert_id}: {e}")
-
-        # Insert
-        row = {
+        # GeoIP columns from the local databases (no network lookups)
+        rows.setdefault(alert_id, geoip.enrich({
             "id": alert_id,
             "event": event,
             "source_ip": source_ip,
             "severity": severity,
             "timestamp": timestamp
-        }
-        try:
-            res = supabase.table("alerts").insert(row).execute()
-            logger.info(f"✅ Inserted alert: {row}")
-            print(f"✅ Inserted alert: {row}")
-        except Exception as e:
-            logger.error(f"❌ Failed to insert alert {alert_id}: {e}")
+        }, source))
+
+    # Existing ids are skipped by the store, so re-pushed alerts are harmless
+    try:
+        inserted = insert_alerts(store, get_rule_engine(), list(rows.values()))
+    except Exception as e:
+        logger.error(f"❌ Failed to insert {len(rows)} alerts: {e}")
+        return None
+    logger.info(f"✅ Inserted {len(inserted)}/{len(rows)} alerts")
+    return inserted
 
 # -------------------------------
 # Main loop
 # -------------------------------
-def main():
-    print("⏳ Starting real-time CrowdSec → Supabase sync...")
-    token = get_lapi_token()
-    if not token:
+async def run_sync(store):
+    """
+    Poll LAPI forever and push new alerts into `store` (an AlertStore).
+    Runs standalone via main() or as a background task of the FastAPI app
+    (LAPI_SYNC_ENABLED=1), where it shares the app's store and LAPI client.
+    """
+    logger.info("⏳ Starting real-time CrowdSec → store sync...")
+    # Fail fast on bad credentials; later expiry is refreshed transparently
+    if not await get_lapi_token():
         return
 
-    last_alerts = set()
+    # Resume from the last checkpoint instead of re-reading the whole history
+    cursor = SyncCursor.load()
+    if cursor.created_at:
+        logger.info(f"Resuming sync from {cursor.created_at.isoformat()} (id {cursor.alert_id})")
+
+    # Bounded by DEDUP_MAX_ENTRIES / DEDUP_TTL_SECONDS instead of growing forever
+    seen = DedupCache()
     while True:
-        alerts = fetch_alerts(token)
-        # Filter new alerts
-        new_alerts = [a for a in alerts if (a.get("uuid") or a.get("id")) not in last_alerts]
+        alerts = await fetch_new_alerts(cursor)
+        if alerts is None:
+            await asyncio.sleep(SYNC_POLL_INTERVAL)
+            continue
+        # Filter new alerts (the overlap window re-reads a few)
+        new_alerts = [a for a in alerts if not seen.contains(a.get("uuid") or a.get("id"))]
         if new_alerts:
-            push_to_supabase(new_alerts)
-            last_alerts.update(a.get("uuid") or a.get("id") for a in new_alerts)
-        time.sleep(5)  # check every 5 seconds
+            inserted = await asyncio.to_thread(push_to_store, store, new_alerts)
+            if inserted is None:
+                # Store down: keep the cursor and dedup state so the next poll retries them
+                await asyncio.sleep(SYNC_POLL_INTERVAL)
+                continue
+            for alert in new_alerts:
+                seen.add(alert.get("uuid") or alert.get("id"))
+            # Feeds rollups/streams in-process; standalone only the rollups listen
+            publish_written(inserted)
+            logger.info(f"Dedup cache: {seen.stats()}")
+        if cursor.advance(alerts):
+            cursor.save()
+        await asyncio.sleep(SYNC_POLL_INTERVAL)
+
+
+async def _flush_rollups(rollups):
+    while True:
+        await asyncio.sleep(ROLLUP_FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(rollups.flush)
+        except Exception as e:
+            logger.error(f"❌ Rollup flush failed: {e}")
+
+
+async def _main():
+    alert_store, rule_store = create_stores()
+    get_rule_engine().load(rule_store.all())
+    # Standalone there is no app to count what we store: keep the rollups here
+    rollups = AlertRollups(alert_store)
+    await asyncio.to_thread(warn_if_not_backfilled, rollups)
+    add_listener(rollups.update)
+    flusher = asyncio.create_task(_flush_rollups(rollups))
+    try:
+        await run_sync(alert_store)
+    finally:
+        flusher.cancel()
+        remove_listener(rollups.update)
+        try:
+            await asyncio.to_thread(rollups.flush)
+        except Exception as e:
+            logger.error(f"❌ Final rollup flush failed: {e}")
+        await close_lapi_client()
+        alert_store.close()
+
+
+def main():
+    asyncio.run(_main())
 
 if __name__ == "__main__":
     main()
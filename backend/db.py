@@ -1,6 +1,8 @@
 # db.py
 from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
 from dotenv import load_dotenv
+import httpx
 import os
 
 load_dotenv()  # load .env file
@@ -8,7 +10,26 @@ load_dotenv()  # load .env file
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Supabase URL or Key not set in .env!")
+# Connection pool and per-request timeout shared by every Supabase call
+STORE_TIMEOUT = float(os.getenv("STORE_TIMEOUT", "10"))
+STORE_MAX_CONNECTIONS = int(os.getenv("STORE_MAX_CONNECTIONS", "20"))
+STORE_MAX_KEEPALIVE = int(os.getenv("STORE_MAX_KEEPALIVE", "10"))
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def create_supabase_client():
+    """
+    Build a Supabase client on top of one pooled httpx.Client. Called once
+    by the storage layer at startup rather than at import time.
+    """
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("Supabase URL or Key not set in .env!")
+
+    http = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=STORE_MAX_CONNECTIONS,
+            max_keepalive_connections=STORE_MAX_KEEPALIVE,
+        ),
+        timeout=STORE_TIMEOUT,
+    )
+    options = SyncClientOptions(postgrest_client_timeout=STORE_TIMEOUT, httpx_client=http)
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
@@ -0,0 +1,90 @@
+import os
+import time
+from collections import OrderedDict
+
+# -------------------------------
+# Dedup config
+# -------------------------------
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "100000"))
+DEDUP_TTL_SECONDS = int(os.getenv("DEDUP_TTL_SECONDS", "86400"))
+
+
+class DedupCache:
+    """
+    Bounded "have I seen this id?" cache: an LRU with a TTL.
+
+    Memory is fixed by `max_entries` (one small dict entry per id). An id is
+    forgotten when it has not been seen for `ttl` seconds, or when it is the
+    least recently seen entry and the cache is full.
+
+    False negatives: a forgotten id that shows up again is reported as new,
+    so the caller may push it a second time. The store write skips ids that
+    already exist, so a repeat costs a round trip but never a duplicate row.
+    There are no false positives: an id is only reported as seen if it
+    really was added before.
+    """
+
+    def __init__(self, max_entries=DEDUP_MAX_ENTRIES, ttl=DEDUP_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def seen(self, key):
+        """Return True if key is already cached; otherwise remember it and return False."""
+        if self.contains(key):
+            return True
+        self.add(key)
+        return False
+
+    def contains(self, key):
+        """True if key is cached (and not expired); a hit refreshes it."""
+        now = time.monotonic()
+        added = self._entries.get(key)
+        if added is not None:
+            if now - added < self.ttl:
+                self._entries[key] = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            del self._entries[key]
+            self.expirations += 1
+        self.misses += 1
+        return False
+
+    def add(self, key):
+        now = time.monotonic()
+        self._entries[key] = now
+        self._entries.move_to_end(key)
+        self._expire(now)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _expire(self, now):
+        # Hits refresh the timestamp and move to the back, so the front is oldest
+        while self._entries:
+            key, added = next(iter(self._entries.items()))
+            if now - added < self.ttl:
+                break
+            del self._entries[key]
+            self.expirations += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
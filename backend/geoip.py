@@ -0,0 +1,225 @@
+import csv
+import ipaddress
+import logging
+import os
+from array import array
+from bisect import bisect_right
+
+from lookup_cache import LookupCache
+
+try:
+    import maxminddb
+except ImportError:  # optional: only needed for .mmdb databases
+    maxminddb = None
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# GeoIP config
+# -------------------------------
+# Local MaxMind (.mmdb) or CSV range databases; enrichment is off when unset
+GEOIP_DB = os.getenv("GEOIP_DB", "")
+GEOIP_ASN_DB = os.getenv("GEOIP_ASN_DB", "")
+
+GEO_COLUMNS = ("country", "city", "latitude", "longitude", "asn")
+
+
+def _float(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(str(value).upper().removeprefix("AS")) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _record(country=None, city=None, latitude=None, longitude=None, asn=None):
+    rec = {
+        "country": country or None,
+        "city": city or None,
+        "latitude": _float(latitude),
+        "longitude": _float(longitude),
+        "asn": _int(asn),
+    }
+    return {k: v for k, v in rec.items() if v is not None}
+
+
+class RangeIndex:
+    """
+    Sorted, non-overlapping [start, end] address ranges with one record
+    each, for O(log n) lookups by bisect. IPv4 bounds live in compact
+    unsigned arrays; records are interned, so ranges that share a location
+    share one dict.
+    """
+
+    def __init__(self):
+        self._v4 = ([], [], [])
+        self._v6 = ([], [], [])
+        self.records = []
+
+    def build(self, ranges):
+        """`ranges` is an iterable of (first address, last address, record)."""
+        interned = {}
+        parts = {4: [], 6: []}
+        for first, last, rec in ranges:
+            key = tuple(sorted(rec.items()))
+            if key not in interned:
+                interned[key] = len(self.records)
+                self.records.append(rec)
+            parts[first.version].append((int(first), int(last), interned[key]))
+        for version, rows in parts.items():
+            rows.sort()
+            starts = [r[0] for r in rows]
+            ends = [r[1] for r in rows]
+            refs = array("I", (r[2] for r in rows))
+            if version == 4:
+                starts, ends = array("I", starts), array("I", ends)
+                self._v4 = (starts, ends, refs)
+            else:
+                self._v6 = (starts, ends, refs)
+        return self
+
+    def __len__(self):
+        return len(self._v4[0]) + len(self._v6[0])
+
+    def lookup(self, addr):
+        starts, ends, refs = self._v4 if addr.version == 4 else self._v6
+        value = int(addr)
+        i = bisect_right(starts, value) - 1
+        if i >= 0 and value <= ends[i]:
+            return self.records[refs[i]]
+        return None
+
+
+def load_csv(path):
+    """
+    Range CSV with a header row: either `network` (CIDR) or `start_ip` and
+    `end_ip`, plus any of country, city, latitude, longitude, asn.
+    """
+    def ranges():
+        with open(path, newline="") as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    if row.get("network"):
+                        net = ipaddress.ip_network(row["network"], strict=False)
+                        first, last = net.network_address, net.broadcast_address
+                    else:
+                        first = ipaddress.ip_address(row["start_ip"])
+                        last = ipaddress.ip_address(row["end_ip"])
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"⚠ Skipping {path}:{line}: {e}")
+                    continue
+                yield first, last, _record(**{c: row.get(c) for c in GEO_COLUMNS})
+
+    return RangeIndex().build(ranges())
+
+
+class _MMDB:
+    """MaxMind database read fully into memory; the reader walks its binary search tree."""
+
+    def __init__(self, path):
+        if maxminddb is None:
+            raise RuntimeError("maxminddb is required for .mmdb GeoIP databases (pip install maxminddb)")
+        self.reader = maxminddb.open_database(path, maxminddb.MODE_MEMORY)
+
+    def __len__(self):
+        return self.reader.metadata().node_count
+
+    def lookup(self, addr):
+        data = self.reader.get(addr)
+        if not data:
+            return None
+        location = data.get("location") or {}
+        return _record(
+            country=(data.get("country") or data.get("registered_country") or {}).get("iso_code"),
+            city=((data.get("city") or {}).get("names") or {}).get("en"),
+            latitude=location.get("latitude"),
+            longitude=location.get("longitude"),
+            asn=data.get("autonomous_system_number"),
+        )
+
+
+def open_database(path):
+    if path.endswith(".mmdb"):
+        return _MMDB(path)
+    return load_csv(path)
+
+
+class GeoIP:
+    """
+    Offline IP -> country / city / coordinates / ASN lookups from local
+    databases only; nothing here touches the network. Fields the databases
+    do not know fall back to what CrowdSec already put on the alert source
+    (cn, latitude, longitude, as_number).
+    """
+
+    def __init__(self, path=GEOIP_DB, asn_path=GEOIP_ASN_DB):
+        self.databases = []
+        # Attack traffic is skewed: most alerts come from a few IPs
+        self.cache = LookupCache(self._lookup)
+        for p in (path, asn_path):
+            if not p:
+                continue
+            try:
+                db = open_database(p)
+            except (OSError, RuntimeError) as e:
+                logger.error(f"❌ GeoIP database {p} not loaded: {e}")
+                continue
+            self.databases.append(db)
+            logger.info(f"🌍 GeoIP database {p} loaded ({len(db)} entries)")
+
+    def lookup(self, ip):
+        """Merged record for `ip` ({} when unknown or not an IP), cached per IP."""
+        if not self.databases:
+            return {}
+        return dict(self.cache.get(ip))
+
+    def _lookup(self, ip):
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return {}
+        merged = {}
+        for db in self.databases:
+            for k, v in (db.lookup(addr) or {}).items():
+                merged.setdefault(k, v)
+        return merged
+
+    def enrich(self, row, source=None):
+        """Set the GEO_COLUMNS on an alert row in place; returns the row."""
+        found = self.lookup(row.get("source_ip"))
+        if isinstance(source, dict):
+            fallback = _record(
+                country=source.get("cn"),
+                latitude=source.get("latitude"),
+                longitude=source.get("longitude"),
+                asn=source.get("as_number"),
+            )
+            if fallback.get("latitude") == 0 and fallback.get("longitude") == 0:
+                # CrowdSec reports 0,0 when it has no location
+                fallback.pop("latitude")
+                fallback.pop("longitude")
+            for k, v in fallback.items():
+                found.setdefault(k, v)
+        for column in GEO_COLUMNS:
+            row[column] = found.get(column)
+        return row
+
+    def stats(self):
+        return {"databases": len(self.databases), "cache": self.cache.stats()}
+
+
+_geoip = None
+
+
+def get_geoip():
+    """Process-wide GeoIP instance, loaded on first use."""
+    global _geoip
+    if _geoip is None:
+        _geoip = GeoIP()
+    return _geoip
@@ -0,0 +1,217 @@
+import base64
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+
+from sync_cursor import parse_ts
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Heavy-hitter config
+# -------------------------------
+HH_WIDTH = int(os.getenv("HH_WIDTH", "2048"))
+HH_DEPTH = int(os.getenv("HH_DEPTH", "4"))
+# Candidate keys tracked per slice; top-N answers are exact-ish for N well below this
+HH_CANDIDATES = int(os.getenv("HH_CANDIDATES", "200"))
+HH_SNAPSHOT_FILE = os.getenv("HH_SNAPSHOT_FILE", "data/heavy_hitters.json")
+HH_SNAPSHOT_SECONDS = int(os.getenv("HH_SNAPSHOT_SECONDS", "60"))
+
+# window -> (slice seconds, slice count)
+WINDOWS = {
+    "5m": (30, 10),
+    "1h": (300, 12),
+    "24h": (3600, 24),
+}
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency sketch: estimates never undercount, and overcount
+    by at most ~2N/width with probability 1 - 2^-depth.
+    """
+
+    def __init__(self, width=HH_WIDTH, depth=HH_DEPTH, counts=None):
+        self.width = width
+        self.depth = depth
+        self.counts = counts if counts is not None else array("Q", bytes(8 * width * depth))
+
+    def _cells(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key, n=1):
+        """Count `key` n more times; returns its new estimate."""
+        counts = self.counts
+        estimate = None
+        for cell in self._cells(key):
+            counts[cell] += n
+            if estimate is None or counts[cell] < estimate:
+                estimate = counts[cell]
+        return estimate
+
+    def estimate(self, key):
+        return min(self.counts[cell] for cell in self._cells(key))
+
+
+class _Slice:
+    """One time slice of a window: a sketch plus its heaviest candidate keys."""
+
+    def __init__(self, start, sketch=None, candidates=None):
+        self.start = start
+        self.sketch = sketch or CountMinSketch()
+        self.candidates = candidates or {}
+
+    def add(self, key, n):
+        self.candidates[key] = self.sketch.add(key, n)
+        if len(self.candidates) > 2 * HH_CANDIDATES:
+            # Amortised top-K: drop the lighter half in one pass
+            self.candidates = dict(heapq.nlargest(HH_CANDIDATES, self.candidates.items(),
+                                                  key=lambda kv: kv[1]))
+
+
+def _dump(s):
+    return {
+        "start": s.start,
+        "counts": base64.b64encode(s.sketch.counts.tobytes()).decode(),
+        "candidates": s.candidates,
+    }
+
+
+def _load(state):
+    counts = array("Q")
+    counts.frombytes(base64.b64decode(state["counts"]))
+    return _Slice(state["start"], CountMinSketch(counts=counts), state["candidates"])
+
+
+class HeavyHitters:
+    """
+    Top attacking source IPs over sliding 5m / 1h / 24h windows and all time.
+
+    Each window is a ring of time slices (WINDOWS); every slice holds a
+    Count-Min Sketch and its top candidates, so memory is bounded no matter
+    how many distinct IPs show up. A query sums the sketch estimates of the
+    live slices for every candidate and keeps the top N. All-time counts
+    are one slice that never expires. Counts are estimates and can only err
+    high.
+
+    update() is an ingest listener; snapshot() (scheduled every
+    HH_SNAPSHOT_SECONDS) writes the slices to HH_SNAPSHOT_FILE so a restart
+    keeps the recent history.
+    """
+
+    def __init__(self, path=HH_SNAPSHOT_FILE):
+        self.path = path
+        self._slices = {name: [] for name in WINDOWS}
+        self._all = _Slice(0)
+        self._lock = threading.Lock()
+
+    def _slice_for(self, name, epoch, now):
+        size, count = WINDOWS[name]
+        start = epoch - epoch % size
+        if start < now - now % size - size * (count - 1):
+            return None  # already outside the window
+        slices = self._slices[name]
+        for s in reversed(slices):
+            if s.start == start:
+                return s
+            if s.start < start:
+                break
+        s = _Slice(start)
+        slices.append(s)
+        slices.sort(key=lambda s: s.start)
+        return s
+
+    def _expire(self, name, now):
+        size, count = WINDOWS[name]
+        horizon = now - now % size - size * (count - 1)
+        self._slices[name] = [s for s in self._slices[name] if s.start >= horizon]
+
+    def update(self, rows):
+        now = int(time.time())
+        hits = {}
+        for row in rows:
+            ip = row.get("source_ip")
+            if not ip:
+                continue
+            ts = parse_ts(row.get("timestamp"))
+            # Alerts dated in the future count as now; that is where they show up
+            epoch = min(int(ts.timestamp()), now) if ts else now
+            hits[(ip, epoch)] = hits.get((ip, epoch), 0) + 1
+        with self._lock:
+            for name in WINDOWS:
+                self._expire(name, now)
+            for (ip, epoch), n in hits.items():
+                self._all.add(ip, n)
+                for name in WINDOWS:
+                    s = self._slice_for(name, epoch, now)
+                    if s is not None:
+                        s.add(ip, n)
+
+    def top(self, window=None, limit=20):
+        """[(source_ip, estimated count)] for the heaviest IPs in `window` (all time when None)."""
+        with self._lock:
+            if window is None:
+                slices = [self._all]
+            else:
+                self._expire(window, int(time.time()))
+                slices = list(self._slices[window])
+            candidates = set()
+            for s in slices:
+                candidates.update(s.candidates)
+            totals = {ip: sum(s.sketch.estimate(ip) for s in slices) for ip in candidates}
+        return heapq.nlargest(limit, totals.items(), key=lambda kv: kv[1])
+
+    # -------------------------------
+    # Snapshots
+    # -------------------------------
+    def snapshot(self):
+        """Write all live slices atomically (temp file + rename). Blocking."""
+        with self._lock:
+            state = {
+                "width": HH_WIDTH,
+                "depth": HH_DEPTH,
+                "windows": {
+                    name: [_dump(s) for s in slices] for name, slices in self._slices.items()
+                },
+                "all": _dump(self._all),
+            }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+        return {"slices": sum(len(v) for v in state["windows"].values())}
+
+    def load(self):
+        """Restore slices from the last snapshot, if it matches the sketch size."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠ Ignoring unreadable heavy-hitter snapshot {self.path}: {e}")
+            return
+        if state.get("width") != HH_WIDTH or state.get("depth") != HH_DEPTH:
+            logger.warning("⚠ Heavy-hitter snapshot has a different sketch size, starting empty")
+            return
+        now = int(time.time())
+        with self._lock:
+            for name, slices in state.get("windows", {}).items():
+                if name not in WINDOWS:
+                    continue
+                self._slices[name] = sorted((_load(s) for s in slices), key=lambda s: s.start)
+                self._expire(name, now)
+            if state.get("all"):
+                self._all = _load(state["all"])
+        logger.info(f"📈 Restored heavy hitters from {self.path}")
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Ingest config
+# -------------------------------
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "500"))
+INGEST_MAX_LINGER_MS = int(os.getenv("INGEST_MAX_LINGER_MS", "200"))
+# A failing batch is retried with exponential backoff, then dead-lettered
+INGEST_RETRIES = int(os.getenv("INGEST_RETRIES", "4"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "1.0"))
+INGEST_DEAD_LETTER_FILE = os.getenv("INGEST_DEAD_LETTER_FILE", "data/ingest_dead_letter.jsonl")
+
+# -------------------------------
+# Written-row listeners
+# -------------------------------
+_listeners = []
+
+
+def add_listener(fn):
+    """Call fn(rows) with every batch of newly stored alert rows."""
+    _listeners.append(fn)
+
+
+def remove_listener(fn):
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def publish_written(rows):
+    """Fan newly stored rows out to the listeners (counters, streams, ...)."""
+    if not rows:
+        return
+    for fn in list(_listeners):
+        try:
+            fn(rows)
+        except Exception as e:
+            logger.error(f"❌ Ingest listener {getattr(fn, '__qualname__', fn)} failed: {e}")
+
+
+class IngestQueue:
+    """
+    Bounded in-process queue of normalized alert rows.
+
+    Writer tasks pull rows off the queue and hand them to `writer` in
+    micro-batches: a batch is flushed once it holds `max_batch` rows or
+    `max_linger` seconds have passed since its first row arrived.
+    `writer` is a blocking callable (rows -> newly inserted rows) and runs
+    in a worker thread so the event loop stays free for other requests.
+    Inserted rows are then handed to publish_written().
+
+    A batch whose write fails is retried `retries` times with exponential
+    backoff. If it still fails it is appended to the dead-letter file,
+    which is queued again on the next start. Writes are upserts by alert
+    id, so replaying a batch never duplicates rows.
+    """
+
+    def __init__(
+        self,
+        writer,
+        maxsize=INGEST_QUEUE_SIZE,
+        workers=INGEST_WORKERS,
+        max_batch=INGEST_MAX_BATCH,
+        max_linger=INGEST_MAX_LINGER_MS / 1000,
+        retries=INGEST_RETRIES,
+        retry_backoff=INGEST_RETRY_BACKOFF,
+        dead_letter_file=INGEST_DEAD_LETTER_FILE,
+    ):
+        self.writer = writer
+        self.maxsize = maxsize
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_linger = max_linger
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.dead_letter_file = dead_letter_file
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.written = 0
+        self.retried = 0
+        self.failed = 0
+        self.replayed = 0
+        self._tasks = []
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "maxsize": self.maxsize,
+            "workers": self.workers,
+            "max_batch": self.max_batch,
+            "max_linger_ms": int(self.max_linger * 1000),
+            "written": self.written,
+            "retried": self.retried,
+            "failed": self.failed,
+            "replayed": self.replayed,
+        }
+
+    def put_nowait_many(self, rows):
+        """Enqueue rows without waiting; the caller must have checked for room."""
+        for row in rows:
+            self.queue.put_nowait(row)
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"ingest-writer-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info(f"🚚 Started {self.workers} ingest writers (queue size {self.maxsize})")
+        if self.dead_letter_file and (os.path.exists(self.dead_letter_file)
+                                      or os.path.exists(self.dead_letter_file + ".replay")):
+            self._tasks.append(asyncio.create_task(self._replay(), name="ingest-replay"))
+
+    def _dead_letter(self, rows):
+        os.makedirs(os.path.dirname(self.dead_letter_file) or ".", exist_ok=True)
+        with open(self.dead_letter_file, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+
+    def _take_dead_letters(self):
+        """Rows of the dead-letter file, which is moved aside while they are requeued."""
+        pending = self.dead_letter_file + ".replay"
+        if not os.path.exists(pending):
+            os.replace(self.dead_letter_file, pending)
+        with open(pending) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        return rows, pending
+
+    async def _replay(self):
+        try:
+            rows, pending = await asyncio.to_thread(self._take_dead_letters)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Dead-lettered alerts not replayed: {e}")
+            return
+        for row in rows:
+            await self.queue.put(row)
+        self.replayed += len(rows)
+        # Queued again; a batch that fails again is dead-lettered afresh
+        await asyncio.to_thread(os.remove, pending)
+        logger.info(f"♻ Requeued {len(rows)} dead-lettered alerts")
+
+    async def stop(self, timeout=10):
+        """Flush whatever is still queued, then cancel the writers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠ Ingest queue not drained on shutdown, {self.depth()} rows dropped")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_linger
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, n, batch):
+        """Write one batch, retrying with backoff; returns the inserted rows or raises."""
+        for attempt in range(self.retries + 1):
+            try:
+                return await asyncio.to_thread(self.writer, batch)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                self.retried += 1
+                logger.warning(f"⚠ Writer {n} failed to flush {len(batch)} rows ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _worker(self, n):
+        while True:
+            batch = await self._next_batch()
+            try:
+                inserted = await self._write(n, batch)
+                self.written += len(inserted)
+                logger.info(f"✅ Writer {n} flushed {len(batch)} rows ({len(inserted)} new)")
+                publish_written(inserted)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"❌ Writer {n} gave up on {len(batch)} rows: {e}")
+                try:
+                    await asyncio.to_thread(self._dead_letter, batch)
+                    logger.info(f"📥 {len(batch)} rows written to {self.dead_letter_file} for replay")
+                except OSError as e:
+                    logger.error(f"❌ Dead-letter write failed, {len(batch)} rows lost: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from lapi_client import get_lapi_client
+from sync_cursor import parse_ts
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# LAPI auth config
+# -------------------------------
+CROWDSEC_LOGIN = os.getenv("CROWDSEC_LOGIN")
+CROWDSEC_PASSWORD = os.getenv("CROWDSEC_PASSWORD")
+# Refresh this many seconds before the token's advertised expiry
+LAPI_TOKEN_REFRESH_MARGIN = int(os.getenv("LAPI_TOKEN_REFRESH_MARGIN", "60"))
+# Used when the login response carries no `expire` field
+LAPI_TOKEN_DEFAULT_TTL = int(os.getenv("LAPI_TOKEN_DEFAULT_TTL", "3600"))
+
+
+class LapiAuthError(Exception):
+    pass
+
+
+class LapiAuth:
+    """
+    Shared JWT lifecycle for CrowdSec LAPI watcher calls.
+
+    The token is cached with its expiry and refreshed LAPI_TOKEN_REFRESH_MARGIN
+    seconds early. A 401 triggers one refresh and one retry. Logins happen
+    under a lock, so concurrent callers that all find the token stale (or
+    all get a 401) share a single /v1/watchers/login round trip.
+    Requests go through the pooled client from lapi_client.
+    """
+
+    def __init__(self, login=CROWDSEC_LOGIN, password=CROWDSEC_PASSWORD, client=None):
+        self.login = login
+        self.password = password
+        self._client = client
+        self._lock = asyncio.Lock()
+        self._token = None
+        self._refresh_at = 0.0
+
+    @property
+    def client(self):
+        return self._client or get_lapi_client()
+
+    def _fresh(self):
+        return self._token is not None and time.monotonic() < self._refresh_at
+
+    async def _login(self):
+        resp = await self.client.post(
+            "/v1/watchers/login",
+            json={"machine_id": self.login, "password": self.password},
+        )
+        if resp.status_code != 200:
+            raise LapiAuthError(f"Login failed: {resp.status_code} {resp.text}")
+        body = resp.json()
+        token = body.get("token")
+        if not token:
+            raise LapiAuthError("Login response has no token")
+
+        ttl = LAPI_TOKEN_DEFAULT_TTL
+        expire = parse_ts(body.get("expire"))
+        if expire:
+            ttl = (expire - datetime.now(timezone.utc)).total_seconds()
+        self._token = token
+        self._refresh_at = time.monotonic() + max(0, ttl - LAPI_TOKEN_REFRESH_MARGIN)
+        logger.info("✅ Authenticated with CrowdSec LAPI")
+        return token
+
+    async def token(self):
+        """Return a valid token, logging in only if the cached one is stale."""
+        if self._fresh():
+            return self._token
+        async with self._lock:
+            if self._fresh():
+                return self._token
+            return await self._login()
+
+    async def refresh(self, stale_token):
+        """Replace `stale_token`; a no-op if another caller already did."""
+        async with self._lock:
+            if self._token is not None and self._token != stale_token:
+                return self._token
+            return await self._login()
+
+    async def request(self, method, path, **kwargs):
+        """Authenticated LAPI request, retried exactly once after a 401."""
+        headers = kwargs.pop("headers", None) or {}
+
+        token = await self.token()
+        resp = await self.client.request(
+            method, path, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+        )
+        if resp.status_code == 401:
+            logger.info("🔑 LAPI token rejected, refreshing")
+            token = await self.refresh(token)
+            resp = await self.client.request(
+                method, path, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+            )
+        return resp
+
+
+_shared = None
+
+
+def get_lapi_auth():
+    """Process-wide LapiAuth, created on first use."""
+    global _shared
+    if _shared is None:
+        _shared = LapiAuth()
+    return _shared
@@ -0,0 +1,67 @@
+import logging
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# LAPI HTTP client config
+# -------------------------------
+CROWDSEC_API_URL = os.getenv("CROWDSEC_API_URL", "http://127.0.0.1:8080")
+LAPI_TIMEOUT = float(os.getenv("LAPI_TIMEOUT", "5"))
+LAPI_CONNECT_TIMEOUT = float(os.getenv("LAPI_CONNECT_TIMEOUT", "3"))
+LAPI_MAX_CONNECTIONS = int(os.getenv("LAPI_MAX_CONNECTIONS", "20"))
+LAPI_MAX_KEEPALIVE = int(os.getenv("LAPI_MAX_KEEPALIVE", "10"))
+LAPI_KEEPALIVE_EXPIRY = float(os.getenv("LAPI_KEEPALIVE_EXPIRY", "30"))
+LAPI_HTTP2 = os.getenv("LAPI_HTTP2", "1") == "1"
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401  (optional, installed by httpx[http2])
+        return True
+    except ImportError:
+        return False
+
+
+def create_lapi_client():
+    """
+    Long-lived AsyncClient for all LAPI traffic: a bounded pool of keep-alive
+    connections, HTTP/2 when `h2` is installed (negotiated over TLS), and a
+    default timeout that individual requests may override with `timeout=`.
+    """
+    http2 = LAPI_HTTP2 and _http2_available()
+    client = httpx.AsyncClient(
+        base_url=CROWDSEC_API_URL.rstrip("/"),
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=LAPI_MAX_CONNECTIONS,
+            max_keepalive_connections=LAPI_MAX_KEEPALIVE,
+            keepalive_expiry=LAPI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(LAPI_TIMEOUT, connect=LAPI_CONNECT_TIMEOUT),
+    )
+    logger.info(f"🔌 LAPI client ready ({CROWDSEC_API_URL}, http2={http2}, pool={LAPI_MAX_CONNECTIONS})")
+    return client
+
+
+_client = None
+
+
+def get_lapi_client():
+    """Process-wide LAPI client, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_lapi_client()
+    return _client
+
+
+async def close_lapi_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
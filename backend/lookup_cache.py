@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# -------------------------------
+# Lookup cache config
+# -------------------------------
+LOOKUP_CACHE_MAX_ENTRIES = int(os.getenv("LOOKUP_CACHE_MAX_ENTRIES", "50000"))
+LOOKUP_CACHE_TTL_SECONDS = int(os.getenv("LOOKUP_CACHE_TTL_SECONDS", "3600"))
+LOOKUP_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("LOOKUP_CACHE_NEGATIVE_TTL_SECONDS", "300"))
+
+
+class LookupCache:
+    """
+    Bounded read-through cache for per-key lookups (GeoIP, ASN, ...): an LRU
+    with a TTL, shared by every thread.
+
+    `loader(key)` runs on a miss. Empty results (None, {}) are cached too,
+    for the shorter `negative_ttl`, so unknown IPs are not looked up again
+    on every alert. Concurrent misses on the same key are single-flight:
+    one caller runs the loader while the others wait for its result. A
+    loader error is raised to its caller and not cached.
+
+    With skewed traffic the loader runs about once per distinct key per TTL,
+    however many alerts share that key.
+    """
+
+    def __init__(self, loader, max_entries=LOOKUP_CACHE_MAX_ENTRIES, ttl=LOOKUP_CACHE_TTL_SECONDS,
+                 negative_ttl=LOOKUP_CACHE_NEGATIVE_TTL_SECONDS):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> threading.Event
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    expires_at, value = entry
+                    if time.monotonic() < expires_at:
+                        self._entries.move_to_end(key)
+                        if value:
+                            self.hits += 1
+                        else:
+                            self.negative_hits += 1
+                        return value
+                    del self._entries[key]
+                    self.expirations += 1
+
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    self.misses += 1
+                    done = self._inflight[key] = threading.Event()
+                    break
+                self.coalesced += 1
+            # Someone else is loading this key; use their result once it lands
+            waiting.wait()
+
+        try:
+            value = self.loader(key)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+                del self._inflight[key]
+            done.set()
+            raise
+
+        with self._lock:
+            ttl = self.ttl if value else self.negative_ttl
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            del self._inflight[key]
+        done.set()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        served = self.hits + self.negative_hits
+        total = served + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "negative_ttl_seconds": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(served / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "errors": self.errors,
+        }
@@ -1,11 +1,146 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="CrowdSec Sentinel Backend", version="0.1.0")
+from admission import AdmissionController
+from archive import ARCHIVE_ENABLED, ARCHIVE_INTERVAL_SECONDS, AlertArchive
+from broadcast import BroadcastHub
+from cardinality import HLL_FLUSH_SECONDS, DistinctAttackers
+from geoip import get_geoip
+from heavy_hitters import HH_SNAPSHOT_SECONDS, HeavyHitters
+from ingest import IngestQueue, add_listener, remove_listener
+from lapi_client import close_lapi_client, get_lapi_client
+from rollups import ROLLUP_FLUSH_SECONDS, ROLLUP_PRUNE_SECONDS, AlertRollups, warn_if_not_backfilled
+from retention import RETENTION_ENABLED, RETENTION_INTERVAL_SECONDS, RetentionJob
+from rule_engine import get_rule_engine, insert_alerts
+from rule_import import close_import_pool
+from rule_search import get_rule_index
+from scheduler import Scheduler
+from storage import create_stores
+
+LAPI_SYNC_ENABLED = os.getenv("LAPI_SYNC_ENABLED", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Optional cold tier for old alerts, merged into reads by the AlertStore
+    archive = None
+    if ARCHIVE_ENABLED:
+        try:
+            archive = AlertArchive()
+        except RuntimeError as e:
+            logger.error(f"❌ Alert archive disabled: {e}")
+
+    # One storage client / pool for the whole app, injected into routers
+    app.state.alert_store, app.state.rule_store = await asyncio.to_thread(
+        partial(create_stores, archive=archive)
+    )
+
+    # Local GeoIP databases, loaded once before the first alert arrives
+    await asyncio.to_thread(get_geoip)
+
+    # Uploaded rules, evaluated against each batch of newly written alerts
+    # and indexed for /rules/search
+    rules = get_rule_engine()
+    stored_rules = await asyncio.to_thread(
+        app.state.rule_store.all, ("id", "name", "description", "tags", "content", "created_at")
+    )
+    await asyncio.to_thread(rules.load, stored_rules)
+    await asyncio.to_thread(get_rule_index().load, stored_rules)
+    del stored_rules
+
+    def write_alerts(rows):
+        return insert_alerts(app.state.alert_store, rules, rows)
+
+    app.state.ingest = IngestQueue(write_alerts)
+    app.state.admission = AdmissionController(app.state.ingest)
+    await app.state.ingest.start()
+
+    # Sliding-window top source IPs, restored from the last snapshot
+    app.state.heavy_hitters = HeavyHitters()
+    await asyncio.to_thread(app.state.heavy_hitters.load)
+    add_listener(app.state.heavy_hitters.update)
+
+    # Distinct attackers per (scenario, hour), merged in the store
+    app.state.distinct = DistinctAttackers(app.state.alert_store)
+    add_listener(app.state.distinct.update)
+
+    # Minute/hour/day/lifetime alert counts behind every /stats count,
+    # flushed to the store by the scheduler
+    app.state.rollups = AlertRollups(app.state.alert_store)
+    await asyncio.to_thread(warn_if_not_backfilled, app.state.rollups)
+    add_listener(app.state.rollups.update)
+
+    # Live /alerts/stream clients share this single fan-out
+    app.state.hub = BroadcastHub()
+    add_listener(app.state.hub.publish)
+
+    # One pooled LAPI client for the routers and the in-process sync loop
+    app.state.lapi = get_lapi_client()
+    sync_task = None
+    if LAPI_SYNC_ENABLED:
+        from crowdsec_sync import run_sync
+
+        sync_task = asyncio.create_task(run_sync(app.state.alert_store), name="lapi-sync")
+
+    # Background maintenance: rollup flushes, archive tiering, retention
+    app.state.scheduler = Scheduler()
+    app.state.scheduler.add("rollup-flush", app.state.rollups.flush, ROLLUP_FLUSH_SECONDS, quiet=True)
+    app.state.scheduler.add("rollup-prune", app.state.rollups.prune, ROLLUP_PRUNE_SECONDS)
+    app.state.scheduler.add("hll-flush", app.state.distinct.flush, HLL_FLUSH_SECONDS, quiet=True)
+    app.state.scheduler.add("hll-prune", app.state.distinct.prune, ROLLUP_PRUNE_SECONDS)
+    app.state.scheduler.add(
+        "heavy-hitters-snapshot", app.state.heavy_hitters.snapshot, HH_SNAPSHOT_SECONDS, quiet=True
+    )
+    # Tiering and retention both move or delete alerts: run them one at a time
+    if archive:
+        app.state.scheduler.add(
+            "archive", partial(archive.tier, app.state.alert_store), ARCHIVE_INTERVAL_SECONDS,
+            group="alerts",
+        )
+    if RETENTION_ENABLED:
+        app.state.scheduler.add(
+            "retention", RetentionJob(app.state.alert_store, archive), RETENTION_INTERVAL_SECONDS,
+            group="alerts",
+        )
+    await app.state.scheduler.start()
+
+    yield
+
+    await app.state.scheduler.stop()
+    if sync_task:
+        sync_task.cancel()
+        await asyncio.gather(sync_task, return_exceptions=True)
+    await app.state.ingest.stop()
+    remove_listener(app.state.rollups.update)
+    remove_listener(app.state.heavy_hitters.update)
+    remove_listener(app.state.distinct.update)
+    for name, flush in (("rollup", app.state.rollups.flush), ("sketch", app.state.distinct.flush)):
+        try:
+            await asyncio.to_thread(flush)
+        except Exception as e:
+            logger.error(f"❌ Final {name} flush failed: {e}")
+    try:
+        await asyncio.to_thread(app.state.heavy_hitters.snapshot)
+    except OSError as e:
+        logger.error(f"❌ Final heavy-hitter snapshot failed: {e}")
+    remove_listener(app.state.hub.publish)
+    app.state.hub.close()
+    await close_lapi_client()
+    await asyncio.to_thread(close_import_pool)
+    app.state.alert_store.close()
+
+
+app = FastAPI(title="CrowdSec Sentinel Backend", version="0.1.0", lifespan=lifespan)
 
 # Allow frontend
 allowed = [
@@ -28,8 +163,12 @@ app.add_middleware(
 # Routers
 from routers.alerts import router as alerts_router
 from routers.rules import router as rules_router
+from routers.stats import router as stats_router
+from routers.stream import router as stream_router
 app.include_router(alerts_router)
 app.include_router(rules_router)
+app.include_router(stats_router)
+app.include_router(stream_router)
 
 @app.get("/")
 def root():
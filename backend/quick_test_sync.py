@@ -2,16 +2,14 @@
 import uuid
 from datetime import datetime
 import logging
-from supabase import create_client
 from dotenv import load_dotenv
-import os
 
 # Load environment variables
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+from storage import create_stores
+
+alert_store, _ = create_stores()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("supabase-test")
@@ -26,7 +24,7 @@ test_alert = {
 }
 
 try:
-    res = supabase.table("alerts").insert(test_alert).execute()
-    logger.info(f"Inserted test alert: {test_alert}, response={res.data}")
+    res = alert_store.insert([test_alert])
+    logger.info(f"Inserted test alert: {test_alert}, response={res}")
 except Exception as e:
     logger.error(f"Failed to insert test alert: {e}")
@@ -0,0 +1,109 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from classifier import normalize_severity
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Retention config
+# -------------------------------
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "0") == "1"
+# Days to keep per severity; "default" covers every severity not listed
+RETENTION_POLICY = os.getenv("RETENTION_POLICY", "Critical=365,High=180,default=90")
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "1000"))
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+# Whole archive day partitions older than this are dropped (0 keeps them forever)
+RETENTION_ARCHIVE_DAYS = int(os.getenv("RETENTION_ARCHIVE_DAYS", "365"))
+
+
+def parse_policy(spec):
+    """'Critical=365,default=90' -> {'Critical': 365, 'default': 90}"""
+    policy = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        severity, days = part.split("=", 1)
+        severity = severity.strip()
+        # Severities are stored case-normalised ("high" -> "High")
+        policy[severity if severity == "default" else normalize_severity(severity)] = int(days)
+    policy.setdefault("default", 90)
+    return policy
+
+
+def longest_retention_days():
+    """Days the oldest alerts the retention job deletes were kept; 0 when it is off."""
+    return max(parse_policy(RETENTION_POLICY).values()) if RETENTION_ENABLED else 0
+
+
+def _cutoff(now, days):
+    return (now - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class RetentionJob:
+    """
+    Enforces the per-severity retention policy on the primary alert store
+    and, when enabled, the archive.
+
+    Expired rows are removed RETENTION_BATCH at a time (oldest first), so no
+    single delete holds a long lock. Counts are not touched: the rollups
+    (rollups.py) were bumped when the alerts were stored, and their hour
+    rows are kept at least as long as the longest policy, so long-range
+    charts keep working after the detail is gone. Archived day partitions
+    holding expired rows are rewritten without them, so alerts tiered out
+    before their severity's retention ran out still expire on time.
+    """
+
+    def __init__(self, store, archive=None, policy=None, batch=RETENTION_BATCH,
+                 archive_days=RETENTION_ARCHIVE_DAYS):
+        self.store = store
+        self.archive = archive
+        self.policy = policy or parse_policy(RETENTION_POLICY)
+        self.batch = batch
+        self.archive_days = archive_days
+
+    def _expire(self, filters):
+        removed = 0
+        while True:
+            rows = self.store.page(["id", "timestamp"], filters, None, False, self.batch,
+                                   include_archive=False)
+            if not rows:
+                break
+            removed += self.store.delete([r["id"] for r in rows])
+            if len(rows) < self.batch:
+                break
+        return removed
+
+    def __call__(self):
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+
+        by_severity = {}
+        listed = [s for s in self.policy if s != "default"]
+        for severity in listed:
+            by_severity[severity] = self._expire(
+                {"severity": [severity], "until": _cutoff(now, self.policy[severity])}
+            )
+        by_severity["default"] = self._expire(
+            {"exclude_severity": listed, "until": _cutoff(now, self.policy["default"])}
+        )
+
+        if self.archive is not None:
+            archived = self.archive.expire(
+                {s: _cutoff(now, self.policy[s]) for s in listed}, _cutoff(now, self.policy["default"])
+            )
+            for severity, n in archived.items():
+                key = severity if severity in listed else "default"
+                by_severity[key] += n
+
+        report = {
+            "removed": sum(by_severity.values()),
+            "by_severity": by_severity,
+            "seconds": round(time.monotonic() - started, 3),
+        }
+        if self.archive is not None and self.archive_days:
+            oldest_kept = (now - timedelta(days=self.archive_days)).date().isoformat()
+            report["archive_days_dropped"] = self.archive.drop_before(oldest_kept)
+        return report
@@ -0,0 +1,206 @@
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from retention import longest_retention_days
+from sync_cursor import parse_ts
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Rollup config
+# -------------------------------
+ROLLUP_FLUSH_SECONDS = int(os.getenv("ROLLUP_FLUSH_SECONDS", "10"))
+ROLLUP_PRUNE_SECONDS = int(os.getenv("ROLLUP_PRUNE_SECONDS", "3600"))
+ROLLUP_MINUTE_RETENTION_DAYS = int(os.getenv("ROLLUP_MINUTE_RETENTION_DAYS", "7"))
+ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "180"))
+# Most buckets a range query may span at the resolution it is served from
+ROLLUP_MAX_POINTS = int(os.getenv("ROLLUP_MAX_POINTS", "500"))
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+# Lifetime counts per (scenario, severity) live under one fixed bucket
+TOTAL = "total"
+TOTAL_BUCKET = "1970-01-01T00:00:00Z"
+# Which stored alerts the live counts cover: the first app start records the
+# newest stored (timestamp, id) as bucket and event with a count of 0;
+# backfill_rollups.py counts every alert up to it and sets the count to 1
+BACKFILL = "backfill"
+END_OF_TIME = "9999-12-31T23:59:59Z"
+
+
+def _iso_z(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def count_rows(rows):
+    """Counter of (resolution, bucket, event, severity) -> alerts for `rows`."""
+    deltas = Counter()
+    for row in rows:
+        event = row.get("event") or "unknown"
+        severity = row.get("severity") or "unknown"
+        deltas[(TOTAL, TOTAL_BUCKET, event, severity)] += 1
+        ts = parse_ts(row.get("timestamp"))
+        if not ts:
+            continue
+        epoch = int(ts.timestamp())
+        for name, size in RESOLUTIONS.items():
+            deltas[(name, _iso_z(epoch - epoch % size), event, severity)] += 1
+    return deltas
+
+
+class AlertRollups:
+    """
+    Alert counts per (bucket, scenario, severity) at minute, hour and day
+    resolution, plus lifetime totals, kept in the store's alert_rollups
+    table. The one source of alert counts: /stats/histogram, /stats/rollups,
+    /stats/severity and /stats/scenarios all read it.
+
+    update() is an ingest listener: it only bumps in-memory deltas, so the
+    write path never waits on the store. flush() (run by the scheduler every
+    ROLLUP_FLUSH_SECONDS) adds the pending deltas in one batch; query()
+    merges stored rows with whatever has not been flushed yet. Minute rows
+    are kept for ROLLUP_MINUTE_RETENTION_DAYS, hour rows for
+    ROLLUP_HOUR_RETENTION_DAYS or the longest retention policy if longer,
+    day and total rows forever. Being stored,
+    the counts survive restarts and are shared by every worker; alerts
+    stored before rollups existed are counted once by backfill_rollups.py.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        # Hour rows outlive every alert the retention job may still delete
+        hour_days = max(ROLLUP_HOUR_RETENTION_DAYS, longest_retention_days())
+        self.retention = {
+            "minute": ROLLUP_MINUTE_RETENTION_DAYS * 86400,
+            "hour": hour_days * 86400,
+            "day": None,
+            TOTAL: None,
+        }
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def update(self, rows):
+        deltas = count_rows(rows)
+        with self._lock:
+            self._pending.update(deltas)
+
+    def flush(self):
+        """Write pending deltas to the store (blocking). Failed deltas are kept for the next flush."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return {"flushed": 0}
+        rows = [
+            {"resolution": r, "bucket": b, "event": e, "severity": s, "count": c}
+            for (r, b, e, s), c in pending.items()
+        ]
+        try:
+            self.store.add_rollups(rows)
+        except Exception:
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return {"flushed": len(rows)}
+
+    def prune(self):
+        """Drop rollup rows past their resolution's retention (blocking)."""
+        now = datetime.now(timezone.utc)
+        removed = {}
+        for name, seconds in self.retention.items():
+            if seconds:
+                before = (now - timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+                removed[name] = self.store.delete_rollups(name, before)
+        return {"removed": removed}
+
+    def totals(self):
+        """Lifetime Counter of (event, severity) -> alerts, stored plus unflushed. Blocking."""
+        counts = Counter()
+        for row in self.store.rollups(TOTAL, TOTAL_BUCKET, _iso_z(1)):
+            counts[(row["event"], row["severity"])] += row["count"]
+        with self._lock:
+            pending = list(self._pending.items())
+        for (r, _, e, s), c in pending:
+            if r == TOTAL:
+                counts[(e, s)] += c
+        return counts
+
+    def pick_resolution(self, since, until):
+        """Finest resolution that is still retained at `since` and fits ROLLUP_MAX_POINTS."""
+        span = (until - since).total_seconds()
+        age = (datetime.now(timezone.utc) - since).total_seconds()
+        for name, size in RESOLUTIONS.items():
+            kept = self.retention[name]
+            if span / size <= ROLLUP_MAX_POINTS and (kept is None or age <= kept):
+                return name
+        return "day"
+
+    def query(self, resolution, since, until, event=None, severity=None, group_by="severity"):
+        """
+        Zero-filled [{bucket, count, groups}] per bucket in [since, until)
+        (datetimes), with `groups` split by severity or event, from stored
+        rollups plus unflushed deltas. Blocking.
+        """
+        size = RESOLUTIONS[resolution]
+        start = int(since.timestamp())
+        start -= start % size
+        end = int(until.timestamp())
+        lo, hi = _iso_z(start), _iso_z(end)
+
+        counts = {}
+        for row in self.store.rollups(resolution, lo, hi, event, severity):
+            key = (row["bucket"], row[group_by])
+            counts[key] = counts.get(key, 0) + row["count"]
+        with self._lock:
+            pending = list(self._pending.items())
+        for (r, b, e, s), c in pending:
+            if r != resolution or not (lo <= b < hi):
+                continue
+            if (event and e != event) or (severity and s not in severity):
+                continue
+            key = (b, s if group_by == "severity" else e)
+            counts[key] = counts.get(key, 0) + c
+
+        buckets = {_iso_z(b): {"bucket": _iso_z(b), "count": 0, "groups": {}}
+                   for b in range(start, end, size)}
+        for (b, group), c in counts.items():
+            if b in buckets:
+                buckets[b]["count"] += c
+                buckets[b]["groups"][group] = c
+        return list(buckets.values())
+
+
+def backfill_mark(store):
+    """
+    The backfill marker as {bucket, event, count}, recorded on the first
+    call: it must run before any alert is counted live. Blocking. Workers
+    that started together may each have written one; the oldest is the one
+    that counts, the alerts after it were counted live.
+    """
+    rows = store.rollups(BACKFILL, "", END_OF_TIME)
+    if rows:
+        return min(rows, key=lambda r: (r["bucket"], r["event"]))
+    newest = store.page(["id", "timestamp"], {}, None, True, 1)
+    if newest:
+        mark = {"bucket": newest[0]["timestamp"], "event": str(newest[0]["id"]), "count": 0}
+    else:
+        # Nothing stored yet: every alert will be counted live
+        mark = {"bucket": TOTAL_BUCKET, "event": "", "count": 1}
+    # Counts are added, so a concurrent first start cannot clobber a done marker
+    store.add_rollups([{"resolution": BACKFILL, "severity": "", **mark}])
+    return mark
+
+
+def warn_if_not_backfilled(rollups):
+    """
+    Startup check (blocking): record the backfill marker on the first start
+    and warn while backfill_rollups.py has not counted the alerts stored
+    before it.
+    """
+    mark = backfill_mark(rollups.store)
+    if not mark["count"]:
+        logger.warning(
+            f"⚠ Alerts stored up to {mark['bucket']} are missing from the rollups; "
+            "stop the app and run backfill_rollups.py once"
+        )
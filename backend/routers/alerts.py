@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Request, HTTPException
-from supabase import create_client
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
 import os, logging
 from dotenv import load_dotenv
 from datetime import datetime
+import asyncio
+import base64
+import csv
+import io
+import json
 import uuid
-import requests
+
+from lapi_auth import get_lapi_auth
+from storage import get_alert_store
+from classifier import get_classifier, parse_severities
+from geoip import get_geoip
+from storage.base import ALERT_COLUMNS
 
 # Load .env
 load_dotenv()
@@ -15,30 +26,23 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Supabase config
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-if not SUPABASE_URL or not SUPABASE_KEY:
-    logger.error("❌ Missing Supabase configuration in .env")
-    raise Exception("Supabase URL or Key not set")
-
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# CrowdSec config
-CROWDSEC_API_URL = os.getenv("CROWDSEC_API_URL", "http://127.0.0.1:8080")
-CROWDSEC_LOGIN = os.getenv("CROWDSEC_LOGIN")
-CROWDSEC_PASSWORD = os.getenv("CROWDSEC_PASSWORD")
+# Read config
+ALERTS_PAGE_DEFAULT = int(os.getenv("ALERTS_PAGE_DEFAULT", "100"))
+ALERTS_PAGE_MAX = int(os.getenv("ALERTS_PAGE_MAX", "1000"))
+ALERT_FIELDS = ALERT_COLUMNS
+ALERTS_EXPORT_PAGE = int(os.getenv("ALERTS_EXPORT_PAGE", "1000"))
 
 
-def get_lapi_session():
-    """Authenticate to CrowdSec LAPI and return session with JWT cookie."""
-    session = requests.Session()
-    payload = {"login": CROWDSEC_LOGIN, "password": CROWDSEC_PASSWORD}
+async def get_lapi_session():
+    """
+    Return the shared LAPI auth (and its pooled client), logging in only if
+    the cached JWT is stale. Usable as a FastAPI dependency.
+    """
+    auth = get_lapi_auth()
     try:
-        resp = session.post(f"{CROWDSEC_API_URL}/v1/login", json=payload)
-        resp.raise_for_status()
-        return session
-    except requests.exceptions.RequestException as e:
+        await auth.token()
+        return auth
+    except Exception as e:
         logger.error(f"LAPI login failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to login to CrowdSec LAPI")
 
@@ -50,68 +54,231 @@ def parse_meta(meta_list):
     return {}
 
 
+def encode_cursor(row):
+    """Opaque page cursor for a row: its (timestamp, id) keyset position."""
+    raw = json.dumps([row["timestamp"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, alert_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(timestamp), str(alert_id)
+    except Exception:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+
+def parse_fields(fields):
+    """Validate a `fields=` projection; id and timestamp are always kept for cursors."""
+    if not fields:
+        return list(ALERT_FIELDS)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in ALERT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    return [f for f in ALERT_FIELDS if f in wanted or f in ("id", "timestamp")]
+
+
+def query_alerts_page(store, limit, before=None, after=None, severity=None, event=None,
+                      source_ip=None, since=None, until=None, fields=None):
+    """
+    One keyset page of alerts ordered newest first by (timestamp, id).
+
+    `before` returns rows older than that cursor (next page), `after` rows
+    newer than it (previous page). Cost is bounded by `limit` whatever the
+    table size, given an index on (timestamp, id).
+    """
+    columns = parse_fields(fields)
+    filters = {
+        "severity": parse_severities(severity),
+        "event": event,
+        "source_ip": source_ip,
+        "since": since,
+        "until": until,
+    }
+    descending = after is None
+    cursor = before or after
+    keyset = decode_cursor(cursor) if cursor else None
+
+    rows = store.page(columns, filters, keyset, descending, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not descending:
+        rows.reverse()
+
+    return {
+        "items": rows,
+        "limit": limit,
+        # Older rows exist past the last item (or we came from a newer page)
+        "next_cursor": encode_cursor(rows[-1]) if rows and (has_more or not descending) else None,
+        # Newer rows exist before the first item (or we came from an older page)
+        "prev_cursor": encode_cursor(rows[0]) if rows and (cursor and (descending or has_more)) else None,
+    }
+
+
 @router.get("/alerts")
-def get_alerts():
-    """Fetch alerts from Supabase."""
+def get_alerts(
+    limit: int = Query(ALERTS_PAGE_DEFAULT, ge=1, le=ALERTS_PAGE_MAX),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    severity: Optional[str] = Query(None, description="Comma-separated severities"),
+    event: Optional[str] = Query(None, description="Scenario name, `*` as wildcard"),
+    source_ip: Optional[str] = None,
+    since: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    until: Optional[str] = Query(None, description="ISO timestamp, exclusive"),
+    fields: Optional[str] = Query(None, description="Comma-separated projection"),
+    store=Depends(get_alert_store),
+):
+    """Fetch one page of alerts from the store, newest first."""
+    if before and after:
+        raise HTTPException(status_code=422, detail="Use either 'before' or 'after', not both")
     try:
-        res = supabase.table("alerts").select("*").execute()
-        return res.data
+        return query_alerts_page(store, limit, before, after, severity, event, source_ip, since, until, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching alerts: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch alerts")
 
 
-@router.post("/alerts")
+async def _export_pages(store, filters):
+    """Walk every matching alert page by page; only one page is held at a time."""
+    cursor = None
+    while True:
+        page = await asyncio.to_thread(
+            query_alerts_page, store, ALERTS_EXPORT_PAGE, before=cursor, **filters
+        )
+        if page["items"]:
+            yield page["items"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return
+
+
+async def _ndjson_stream(store, filters):
+    async for rows in _export_pages(store, filters):
+        yield "".join(json.dumps(row) + "\n" for row in rows)
+
+
+async def _csv_stream(store, filters, columns):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    yield buf.getvalue()
+    async for rows in _export_pages(store, filters):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue()
+
+
+@router.get("/alerts/export")
+def export_alerts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    severity: Optional[str] = None,
+    event: Optional[str] = None,
+    source_ip: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    fields: Optional[str] = None,
+    store=Depends(get_alert_store),
+):
+    """
+    Stream every matching alert as NDJSON (default) or CSV, newest first.
+    Rows are read ALERTS_EXPORT_PAGE at a time, so memory stays flat no
+    matter how large the table is.
+    """
+    columns = parse_fields(fields)
+    filters = {
+        "severity": severity, "event": event, "source_ip": source_ip,
+        "since": since, "until": until, "fields": fields,
+    }
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    if format == "csv":
+        body, media_type = _csv_stream(store, filters, columns), "text/csv"
+    else:
+        body, media_type = _ndjson_stream(store, filters), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="alerts-{stamp}.{format}"'},
+    )
+
+
+def normalize_alert(alert):
+    """Turn a raw CrowdSec alert into an `alerts` table row."""
+    alert_uuid = alert.get("uuid") or str(uuid.uuid4())
+    scenario = alert.get("scenario") or alert.get("event") or "unknown"
+
+    # parse meta list
+    meta_dict = parse_meta(alert.get("meta"))
+
+    source_ip = (
+        (alert.get("source") or {}).get("ip")
+        or meta_dict.get("source_ip")
+        or "unknown"
+    )
+    # An explicit meta severity wins; otherwise classify the scenario
+    severity = get_classifier().resolve(scenario, meta_dict.get("severity"))
+    timestamp = alert.get("created_at") or datetime.utcnow().isoformat() + "Z"
+
+    row = {
+        "id": alert_uuid,
+        "source_ip": source_ip,
+        "event": scenario,
+        "severity": severity,
+        "timestamp": timestamp,
+    }
+    return get_geoip().enrich(row, alert.get("source"))
+
+
+@router.get("/alerts/queue")
+def get_ingest_queue(request: Request):
+    """Expose ingest queue depth, writer counters and admitted/shed counts."""
+    return {
+        **request.app.state.ingest.stats(),
+        "admission": request.app.state.admission.stats(),
+    }
+
+
+@router.post("/alerts", status_code=202)
 async def receive_alerts(request: Request):
-    """Receive alerts from CrowdSec notifier and insert safely into Supabase."""
+    """
+    Receive alerts from CrowdSec notifier and queue them for the background
+    writers. Returns 202 as soon as the payload is validated and queued,
+    429/503 with Retry-After when the source or the queue is saturated.
+    """
     try:
         payload = await request.json()
+    except Exception:
+        raise HTTPException(status_code=422, detail="Body must be valid JSON")
 
+    if not isinstance(payload, (list, dict)):
+        raise HTTPException(status_code=422, detail="Expected an alert object or a list of alerts")
+
+    try:
         # Handle both dict and list payloads
         alerts = payload if isinstance(payload, list) else [payload]
 
         logger.info(f"📥 Received {len(alerts)} alerts from CrowdSec")
 
-        inserted = 0
+        # Normalize the whole payload first, dropping repeated ids
+        rows = {}
         for alert in alerts:
             try:
-                alert_uuid = alert.get("uuid") or str(uuid.uuid4())
-                scenario = alert.get("scenario") or alert.get("event") or "unknown"
-
-                # parse meta list
-                meta_dict = parse_meta(alert.get("meta"))
-
-                source_ip = (
-                    (alert.get("source") or {}).get("ip")
-                    or meta_dict.get("source_ip")
-                    or "unknown"
-                )
-                severity = meta_dict.get("severity", "info")
-                timestamp = alert.get("created_at") or datetime.utcnow().isoformat() + "Z"
-
-                # Skip duplicates
-                existing = supabase.table("alerts").select("id").eq("id", alert_uuid).execute()
-                if existing.data:
-                    logger.debug(f"⚠️ Skipping duplicate alert: {alert_uuid}")
-                    continue
-
-                row = {
-                    "id": alert_uuid,
-                    "source_ip": source_ip,
-                    "event": scenario,
-                    "severity": severity,
-                    "timestamp": timestamp,
-                }
-
-                supabase.table("alerts").insert(row).execute()
-                inserted += 1
-                logger.info(f"✅ Inserted alert into Supabase: {row}")
-
+                row = normalize_alert(alert)
+                rows.setdefault(row["id"], row)
             except Exception as inner_e:
                 logger.error(f"⚠️ Skipped alert due to error: {inner_e} | Raw alert: {alert}")
 
-        return {"status": "success", "inserted": inserted, "total_received": len(alerts)}
+        admission = request.app.state.admission
+        await admission.admit(admission.source_of(request), list(rows.values()))
+
+        return {"status": "accepted", "queued": len(rows), "total_received": len(alerts)}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error processing alerts: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error processing alerts")
@@ -1,10 +1,47 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query
+from typing import List, Optional
 from datetime import datetime, timezone
-from db import supabase
+import asyncio
+import codecs
+import hashlib
+import os
+import time
+
+from rule_engine import RuleError, get_rule_engine, parse_rules
+from rule_import import RULES_IMPORT_MAX_BYTES, ArchiveError, import_rules
+from rule_search import get_rule_index
+from storage import get_rule_store
 
 router = APIRouter()
 
+# -------------------------------
+# Upload config
+# -------------------------------
+RULES_MAX_UPLOAD_BYTES = int(os.getenv("RULES_MAX_UPLOAD_BYTES", str(1024 * 1024)))
+RULES_UPLOAD_CHUNK = int(os.getenv("RULES_UPLOAD_CHUNK", str(64 * 1024)))
+
+
+async def read_upload(file, limit=RULES_MAX_UPLOAD_BYTES):
+    """
+    Read an upload in chunks, hashing and decoding as it goes.
+    Returns (text, sha256 hex digest); 413 once it passes `limit` bytes.
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts, size = [], 0
+    while True:
+        chunk = await file.read(RULES_UPLOAD_CHUNK)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail=f"Rule upload exceeds {limit} bytes")
+        digest.update(chunk)
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), digest.hexdigest()
+
+
 @router.post("/rules/upload")
 async def upload_rule(
     name: str = Form(...),
@@ -12,26 +49,106 @@ async def upload_rule(
     tags: Optional[str] = Form(None),
     content: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
+    store=Depends(get_rule_store),
 ):
     """
-    Upload a new rule into Supabase 'rules' table.
+    Upload a new rule (CrowdSec scenario YAML) into the store's 'rules'
+    table and activate it for incoming alerts. Uploads are streamed up to
+    RULES_MAX_UPLOAD_BYTES; content identical to a stored rule returns
+    that rule's id instead of a new row.
     """
     try:
         if file and file.filename:
-            data = (await file.read()).decode("utf-8", errors="replace")
+            data, content_hash = await read_upload(file)
         elif content:
-            data = content
+            raw = content.encode("utf-8")
+            if len(raw) > RULES_MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Rule upload exceeds {RULES_MAX_UPLOAD_BYTES} bytes")
+            data, content_hash = content, hashlib.sha256(raw).hexdigest()
         else:
             raise HTTPException(status_code=422, detail="Provide either 'content' or 'file'.")
 
+        # Same bytes as a stored rule: hand back that rule, write nothing
+        existing = await asyncio.to_thread(store.by_hash, content_hash)
+        if existing:
+            return {"status": "duplicate", "name": existing.get("name"), "id": existing.get("id"),
+                    "content_hash": content_hash}
+
+        # Reject rules the engine cannot compile before storing them
+        try:
+            parse_rules(data)
+        except RuleError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid rule: {e}")
+
         row = {
             "name": name,
             "description": description,
             "tags": tags,
             "content": data,
+            "content_hash": content_hash,
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
-        supabase.table("rules").insert(row).execute()
-        return {"status": "success", "name": name}
+        saved, created = await asyncio.to_thread(store.insert, row)
+        if not created:
+            return {"status": "duplicate", "name": saved.get("name"), "id": saved.get("id"),
+                    "content_hash": content_hash}
+        compiled = get_rule_engine().add(saved.get("id"), data)
+        get_rule_index().add(saved)
+        return {"status": "success", "name": name, "id": saved.get("id"), "scenarios": len(compiled),
+                "content_hash": content_hash}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save rule: {e}")
+
+
+@router.post("/rules/import")
+async def import_rule_pack(
+    file: UploadFile = File(...),
+    tags: Optional[str] = Form(None),
+    store=Depends(get_rule_store),
+):
+    """
+    Import a rule pack: a zip or tar(.gz) archive of scenario YAML files.
+    Each file is validated, deduplicated by content and stored like an
+    upload, in batched writes; the response reports every file.
+    """
+    if file.size is not None and file.size > RULES_IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Rule pack exceeds {RULES_IMPORT_MAX_BYTES} bytes")
+    try:
+        return await asyncio.to_thread(
+            import_rules, store, get_rule_engine(), file.file, RULES_MAX_UPLOAD_BYTES, tags,
+            get_rule_index(),
+        )
+    except ArchiveError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to import rules: {e}")
+
+
+@router.get("/rules/search")
+def search_rules(
+    q: str = Query("", description="Words to match; 'word*' for a prefix, 'tag:name' for a tag"),
+    tag: List[str] = Query([], description="Tags every result must carry"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+):
+    """
+    Search stored rules by name, description, tags and content, best
+    matches first, served from the in-memory index.
+    """
+    started = time.perf_counter()
+    total, results = get_rule_index().search(q, tag, limit=limit, offset=offset)
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+@router.get("/rules/active")
+def active_rules():
+    """Rule engine counters: active rules, index size, evaluations and matches."""
+    return get_rule_engine().stats()
@@ -0,0 +1,140 @@
+from fastapi import APIRouter, Request, HTTPException, Query
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+import asyncio
+from collections import Counter
+
+from classifier import parse_severities
+from geoip import get_geoip
+from rollups import RESOLUTIONS
+from sync_cursor import parse_ts
+
+router = APIRouter()
+
+# Default histogram span per interval when `since` is omitted
+DEFAULT_SPAN = {"minute": timedelta(hours=1), "hour": timedelta(hours=24)}
+MAX_BUCKETS = 2000
+
+
+@router.get("/stats/severity")
+async def severity_counts(request: Request):
+    """Alert counts per severity, from the lifetime rollups."""
+    totals = await asyncio.to_thread(request.app.state.rollups.totals)
+    counts = Counter()
+    for (_, severity), n in totals.items():
+        counts[severity] += n
+    return {"total": sum(counts.values()), "counts": dict(counts)}
+
+
+@router.get("/stats/scenarios")
+async def scenario_counts(request: Request, limit: int = Query(20, ge=1, le=500)):
+    """Most frequent scenarios with their alert counts, from the lifetime rollups."""
+    totals = await asyncio.to_thread(request.app.state.rollups.totals)
+    counts = Counter()
+    for (event, _), n in totals.items():
+        counts[event] += n
+    return [{"event": k, "count": v} for k, v in counts.most_common(limit)]
+
+
+@router.get("/stats/top-ips")
+def top_source_ips(
+    request: Request,
+    limit: int = Query(20, ge=1, le=500),
+    window: Optional[str] = Query(None, pattern="^(5m|1h|24h)$",
+                                  description="Sliding window; all-time when omitted"),
+):
+    """
+    Top-N attacking source IPs, all-time or over a sliding window. Counts
+    come from Count-Min Sketches: approximate, and may only overestimate.
+    """
+    top = request.app.state.heavy_hitters.top(window, limit)
+    return [{"source_ip": k, "count": v, "approximate": True} for k, v in top]
+
+
+@router.get("/stats/histogram")
+async def alert_histogram(
+    request: Request,
+    interval: str = Query("minute", pattern="^(minute|hour)$"),
+    since: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    until: Optional[str] = Query(None, description="ISO timestamp, exclusive"),
+):
+    """
+    Alert counts per minute or hour over a time range, from the rollups
+    (the same counts as /stats/rollups). Buckets older than the
+    resolution's rollup retention read as zero.
+    """
+    end = parse_ts(until) if until else datetime.now(timezone.utc)
+    start = parse_ts(since) if since else end - DEFAULT_SPAN[interval]
+    if not start or not end or start >= end:
+        raise HTTPException(status_code=422, detail="Invalid 'since'/'until' range")
+
+    if (end - start).total_seconds() / RESOLUTIONS[interval] > MAX_BUCKETS:
+        raise HTTPException(status_code=422, detail=f"Range spans more than {MAX_BUCKETS} buckets")
+
+    buckets = await asyncio.to_thread(request.app.state.rollups.query, interval, start, end)
+    return {"interval": interval, "buckets": [{"bucket": b["bucket"], "count": b["count"]} for b in buckets]}
+
+
+@router.get("/stats/rollups")
+async def alert_rollups(
+    request: Request,
+    since: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    until: Optional[str] = Query(None, description="ISO timestamp, exclusive"),
+    resolution: str = Query("auto", pattern="^(auto|minute|hour|day)$"),
+    event: Optional[str] = Query(None, description="Exact scenario name"),
+    severity: Optional[str] = Query(None, description="Comma-separated severities"),
+    group_by: str = Query("severity", pattern="^(severity|event)$"),
+):
+    """
+    Alert counts per bucket from the pre-aggregated rollups. With
+    resolution=auto the finest resolution that fits the range is used.
+    Defaults to the last 24 hours.
+    """
+    end = parse_ts(until) if until else datetime.now(timezone.utc)
+    start = parse_ts(since) if since else end - timedelta(hours=24)
+    if not start or not end or start >= end:
+        raise HTTPException(status_code=422, detail="Invalid 'since'/'until' range")
+
+    rollups = request.app.state.rollups
+    if resolution == "auto":
+        resolution = rollups.pick_resolution(start, end)
+    if (end - start).total_seconds() / RESOLUTIONS[resolution] > MAX_BUCKETS:
+        raise HTTPException(status_code=422, detail=f"Range spans more than {MAX_BUCKETS} buckets")
+
+    severities = parse_severities(severity)
+    buckets = await asyncio.to_thread(
+        rollups.query, resolution, start, end, event, severities, group_by
+    )
+    return {"resolution": resolution, "group_by": group_by, "buckets": buckets}
+
+
+@router.get("/stats/distinct-ips")
+async def distinct_source_ips(
+    request: Request,
+    since: Optional[str] = Query(None, description="ISO timestamp, inclusive"),
+    until: Optional[str] = Query(None, description="ISO timestamp, exclusive"),
+    event: Optional[str] = Query(None, description="Exact scenario name; all scenarios when omitted"),
+):
+    """
+    Approximate number of distinct attacking source IPs (HyperLogLog,
+    about 1.6% standard error) over whole hours. Defaults to the last 24 hours.
+    """
+    end = parse_ts(until) if until else datetime.now(timezone.utc)
+    start = parse_ts(since) if since else end - timedelta(hours=24)
+    if not start or not end or start >= end:
+        raise HTTPException(status_code=422, detail="Invalid 'since'/'until' range")
+
+    result = await asyncio.to_thread(request.app.state.distinct.distinct, start, end, event)
+    return {"event": event, **result}
+
+
+@router.get("/stats/enrichment")
+def enrichment_stats():
+    """GeoIP databases loaded and the per-IP lookup cache counters (hit ratio, ...)."""
+    return get_geoip().stats()
+
+
+@router.get("/stats/jobs")
+def job_status(request: Request):
+    """Last run, result and error of each background maintenance job."""
+    return request.app.state.scheduler.status()
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+import logging
+import os
+
+from broadcast import EVICTED, HubFull
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+STREAM_HEARTBEAT_SECONDS = int(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+
+@router.get("/alerts/stream")
+async def stream_alerts_sse(request: Request):
+    """Live alerts as Server-Sent Events (`event: alert`, JSON row as data)."""
+    hub = request.app.state.hub
+    try:
+        sub = hub.subscribe()
+    except HubFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    batch = await asyncio.wait_for(sub.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if batch is EVICTED:
+                    yield "event: evicted\ndata: {}\n\n"
+                    break
+                for row in batch:
+                    yield f"event: alert\nid: {row.get('id')}\ndata: {json.dumps(row)}\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/alerts/stream")
+async def stream_alerts_ws(websocket: WebSocket):
+    """Live alerts over a WebSocket, one JSON row per message."""
+    hub = websocket.app.state.hub
+    await websocket.accept()
+    try:
+        sub = hub.subscribe()
+    except HubFull as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    async def receive():
+        # Nothing is expected from the client; reading is how a disconnect shows up
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    async def send():
+        while True:
+            batch = await sub.get()
+            if batch is EVICTED:
+                await websocket.close(code=1008, reason="Slow consumer evicted")
+                return
+            for row in batch:
+                await websocket.send_json(row)
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        # Whichever ends first (client gone, eviction, send error) ends the stream
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"⚠ Alert stream client dropped: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        hub.unsubscribe(sub)
+
+
+@router.get("/alerts/stream/stats")
+def stream_stats(request: Request):
+    """Connected stream clients and eviction counters."""
+    return request.app.state.hub.stats()
@@ -0,0 +1,524 @@
+import logging
+import os
+import re
+import threading
+import time
+
+import yaml
+
+from sync_cursor import parse_ts
+
+# libyaml's C parser when PyYAML was built with it, several times faster
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Rule engine config
+# -------------------------------
+# Bucket keys kept per leaky rule before drained buckets are swept
+RULES_MAX_BUCKETS = int(os.getenv("RULES_MAX_BUCKETS", "10000"))
+
+# Alert fields a rule can be indexed on (equality / `in` terms of its filter)
+INDEXED_FIELDS = ("event", "source_ip", "country", "severity", "asn")
+
+# Scenario-style names for the alert row columns
+FIELD_ALIASES = {
+    "scenario": "event",
+    "event": "event",
+    "source_ip": "source_ip",
+    "sourceip": "source_ip",
+    "source.ip": "source_ip",
+    "ip": "source_ip",
+    "severity": "severity",
+    "country": "country",
+    "isocode": "country",
+    "iso_code": "country",
+    "cn": "country",
+    "city": "city",
+    "asn": "asn",
+    "asnumber": "asn",
+    "as_number": "asn",
+    "asnnumber": "asn",
+    "latitude": "latitude",
+    "longitude": "longitude",
+    "timestamp": "timestamp",
+    "id": "id",
+}
+FIELD_PREFIXES = ("evt.Meta.", "evt.Parsed.", "evt.Enriched.", "evt.", "alert.", "Alert.")
+# Columns a stored alert actually has
+ALERT_FIELDS = frozenset(FIELD_ALIASES.values())
+STRING_LITERAL = re.compile(r""""(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'""")
+
+
+class RuleError(ValueError):
+    """An uploaded rule that cannot be parsed or compiled."""
+
+
+def field_name(path):
+    """Map a scenario field path (evt.Meta.source_ip, alert.scenario, ...) to an alert column."""
+    for prefix in FIELD_PREFIXES:
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+            break
+    return FIELD_ALIASES.get(path.lower(), path.lower())
+
+
+def group_columns(expr):
+    """
+    Alert columns a groupby expression refers to, in order. Hub scenarios
+    often build a key (`evt.Meta.source_ip + '/' + evt.Meta.target_user`);
+    the parts stored on alerts make the key, the rest cannot be known here.
+    Falls back to source_ip when none is.
+    """
+    columns = []
+    for path in re.findall(r"[A-Za-z_][\w.]*", STRING_LITERAL.sub("", str(expr))):
+        column = field_name(path)
+        if column in ALERT_FIELDS and column not in columns:
+            columns.append(column)
+    return tuple(columns) or ("source_ip",)
+
+
+def parse_duration(value):
+    """Go-style duration ("10s", "1m30s", "500ms", "2h") or bare seconds -> seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", str(value).strip())
+    if not parts or "".join(n + u for n, u in parts) != str(value).strip():
+        raise RuleError(f"Invalid duration {value!r}")
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+
+# -------------------------------
+# Filter expressions
+# -------------------------------
+TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<num>-?\d+(?:\.\d+)?)
+    | (?P<op>==|!=|<=|>=|&&|\|\||[<>!()\[\],])
+    | (?P<name>[A-Za-z_][\w.]*)
+    )""", re.VERBOSE)
+
+WORD_OPS = {"and": "&&", "or": "||", "not": "!"}
+COMPARE = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and b is not None and a < b,
+    "<=": lambda a, b: a is not None and b is not None and a <= b,
+    ">": lambda a, b: a is not None and b is not None and a > b,
+    ">=": lambda a, b: a is not None and b is not None and a >= b,
+    "in": lambda a, b: b is not None and a in b,
+    "contains": lambda a, b: a is not None and b is not None and str(b) in str(a),
+    "startsWith": lambda a, b: a is not None and b is not None and str(a).startswith(str(b)),
+    "endsWith": lambda a, b: a is not None and b is not None and str(a).endswith(str(b)),
+}
+
+
+def _tokens(expr):
+    pos, out = 0, []
+    expr = expr.strip()
+    while pos < len(expr):
+        m = TOKEN.match(expr, pos)
+        if not m or m.end() == pos:
+            raise RuleError(f"Unexpected input in filter at {pos}: {expr[pos:pos + 20]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        text = m.group(kind)
+        if kind == "str":
+            out.append(("lit", re.sub(r"\\(.)", r"\1", text[1:-1])))
+        elif kind == "num":
+            out.append(("lit", float(text) if "." in text else int(text)))
+        elif kind == "name" and text in WORD_OPS:
+            out.append(("op", WORD_OPS[text]))
+        elif kind == "name" and text in ("in", "contains", "startsWith", "endsWith", "matches"):
+            out.append(("op", text))
+        elif kind == "name" and text in ("true", "false", "nil", "null"):
+            out.append(("lit", {"true": True, "false": False}.get(text)))
+        else:
+            out.append((kind, text))
+    return out
+
+
+class _Parser:
+    """
+    Recursive-descent compiler for the subset of CrowdSec (expr-lang)
+    filters that can be checked against a stored alert: field paths,
+    string/number/list literals, == != < <= > >= in contains startsWith
+    endsWith matches, && || ! (or and/or/not) and parentheses. Produces a
+    closure over the alert row plus the equality terms usable as index keys.
+    Function calls and fields alerts do not store (evt.Meta.log_type, ...)
+    raise RuleError: such a filter cannot be checked against an alert.
+    """
+
+    def __init__(self, expr):
+        self.tokens = _tokens(expr)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        kind, text = self.peek()
+        if kind is None or (value is not None and text != value):
+            raise RuleError(f"Expected {value or 'more input'} in filter, got {text!r}")
+        self.pos += 1
+        return kind, text
+
+    def compile(self):
+        fn, terms = self.or_()
+        if self.pos != len(self.tokens):
+            raise RuleError(f"Unexpected {self.peek()[1]!r} in filter")
+        return fn, terms
+
+    def or_(self):
+        fn, terms = self.and_()
+        parts = [fn]
+        while self.peek() == ("op", "||"):
+            self.take()
+            parts.append(self.and_()[0])
+            terms = []  # an alternative can match without the term
+        if len(parts) == 1:
+            return fn, terms
+        return (lambda row: any(p(row) for p in parts)), terms
+
+    def and_(self):
+        fn, terms = self.not_()
+        parts, terms = [fn], list(terms)
+        while self.peek() == ("op", "&&"):
+            self.take()
+            f, t = self.not_()
+            parts.append(f)
+            terms.extend(t)
+        if len(parts) == 1:
+            return fn, terms
+        return (lambda row: all(p(row) for p in parts)), terms
+
+    def not_(self):
+        if self.peek() == ("op", "!"):
+            self.take()
+            fn, _ = self.not_()
+            return (lambda row: not fn(row)), []
+        return self.compare()
+
+    def compare(self):
+        left, left_field = self.value()
+        kind, op = self.peek()
+        if kind != "op" or (op not in COMPARE and op != "matches"):
+            return (lambda row: bool(left(row))), []
+        self.take()
+        right, right_field = self.value()
+
+        if op == "matches":
+            if right_field is not None:
+                raise RuleError("'matches' needs a literal pattern")
+            try:
+                pattern = re.compile(str(right(None)))
+            except re.error as e:
+                raise RuleError(f"Invalid regex in filter: {e}")
+            return (lambda row: left(row) is not None and bool(pattern.search(str(left(row))))), []
+
+        cmp = COMPARE[op]
+        terms = []
+        if right_field is None and left_field in INDEXED_FIELDS:
+            literal = right(None)
+            if op == "==":
+                terms = [(left_field, [literal])]
+            elif op == "in" and isinstance(literal, list):
+                terms = [(left_field, list(literal))]
+        elif left_field is None and right_field in INDEXED_FIELDS and op == "==":
+            terms = [(right_field, [left(None)])]
+        return (lambda row: cmp(left(row), right(row))), terms
+
+    def value(self):
+        """(row -> value, alert column for a field path, "()" for a sub-expression, None for a literal)"""
+        kind, text = self.take()
+        if kind == "lit":
+            return (lambda row: text), None
+        if (kind, text) == ("op", "("):
+            fn, _ = self.or_()
+            self.take(")")
+            return fn, "()"  # computed, so never treated as a literal
+        if (kind, text) == ("op", "["):
+            items = []
+            while self.peek() != ("op", "]"):
+                item, field = self.value()
+                if field is not None:
+                    raise RuleError("List literals may only hold constants")
+                items.append(item(None))
+                if self.peek() == ("op", ","):
+                    self.take()
+            self.take("]")
+            return (lambda row: items), None
+        if kind == "name":
+            if self.peek() == ("op", "("):
+                raise RuleError(f"Function call {text}() is not supported in filters")
+            column = field_name(text)
+            if column not in ALERT_FIELDS:
+                raise RuleError(f"Field {text!r} is not stored on alerts")
+            return (lambda row: row.get(column)), column
+        raise RuleError(f"Unexpected {text!r} in filter")
+
+
+def compile_filter(expr):
+    """Compile a filter expression -> (predicate(row), [(field, [values])] index terms)."""
+    return _Parser(expr).compile()
+
+
+# -------------------------------
+# Rules
+# -------------------------------
+class CompiledRule:
+    """
+    One scenario: its predicate, index terms and leaky-bucket parameters.
+
+    Hub scenarios mostly filter on parsed log fields alerts do not carry,
+    or call expr-lang functions; when the filter cannot be compiled the
+    rule follows the alerts of the scenario with its name instead, as a
+    trigger (the reason is kept in `fallback`).
+    """
+
+    def __init__(self, rule_id, spec):
+        if not isinstance(spec, dict):
+            raise RuleError("A rule document must be a mapping")
+        self.id = rule_id
+        self.name = str(spec.get("name") or "")
+        self.type = str(spec.get("type") or "trigger")
+        if self.type not in ("trigger", "leaky", "counter", "conditional"):
+            raise RuleError(f"Unsupported rule type {self.type!r}")
+
+        expr = spec.get("filter")
+        self.fallback = None
+        if expr:
+            try:
+                self.predicate, self.terms = compile_filter(str(expr))
+            except RuleError as e:
+                if not self.name:
+                    raise
+                self.fallback = str(e)
+                expr = None
+        if not expr:
+            if not self.name:
+                raise RuleError("A rule needs a 'filter' or a 'name'")
+            # The rule follows alerts of the scenario with its name. Each of
+            # them is already that scenario's overflow: fire on every one
+            name = self.name
+            self.predicate, self.terms = (lambda row: row.get("event") == name), [("event", [name])]
+            self.type = "trigger"
+
+        self.capacity = int(spec.get("capacity", 0) or 0)
+        self.leak_seconds = parse_duration(spec.get("leakspeed")) or 0
+        self.blackhole = parse_duration(spec.get("blackhole")) or 0
+        group = spec.get("groupby")
+        self.group_columns = group_columns(group) if group else ("source_ip",)
+        if self.type == "leaky" and (self.capacity <= 0 or self.leak_seconds <= 0):
+            raise RuleError("Leaky rules need a positive 'capacity' and 'leakspeed'")
+        # group key -> [level, last seen, blackhole until]
+        self.buckets = {}
+
+    def fire(self, row, now):
+        """Feed one matching alert; True when the rule triggers for it."""
+        if self.type != "leaky":
+            return True
+        key = tuple(row.get(c) for c in self.group_columns)
+        level, last, silent_until = self.buckets.get(key) or (0.0, now, 0.0)
+        level = max(0.0, level - (now - last) / self.leak_seconds) + 1
+        if now < silent_until:
+            self.buckets[key] = [level, now, silent_until]
+            return False
+        if level > self.capacity:
+            self.buckets[key] = [0.0, now, now + self.blackhole]
+            return True
+        self.buckets[key] = [level, now, silent_until]
+        if len(self.buckets) > RULES_MAX_BUCKETS:
+            self._sweep(now)
+        return False
+
+    def _sweep(self, now):
+        for key, (level, last, silent_until) in list(self.buckets.items()):
+            if now >= silent_until and level - (now - last) / self.leak_seconds <= 0:
+                del self.buckets[key]
+        if len(self.buckets) > RULES_MAX_BUCKETS:
+            # Still full of live buckets: drop the least recently fed half
+            keep = sorted(self.buckets.items(), key=lambda kv: kv[1][1])[len(self.buckets) // 2:]
+            self.buckets = dict(keep)
+
+
+def load_documents(content):
+    """The non-empty YAML documents in `content`."""
+    try:
+        docs = [d for d in yaml.load_all(content, Loader=SafeLoader) if d is not None]
+    except yaml.YAMLError as e:
+        raise RuleError(f"Invalid YAML: {e}")
+    if not docs:
+        raise RuleError("No rule found in content")
+    return docs
+
+
+def compile_documents(docs, rule_id=None):
+    try:
+        return [CompiledRule(rule_id, doc) for doc in docs]
+    except RuleError:
+        raise
+    except (TypeError, ValueError) as e:
+        raise RuleError(f"Invalid rule: {e}")
+
+
+def parse_rules(content, rule_id=None):
+    """Compile every YAML document in `content` (CrowdSec scenario format)."""
+    return compile_documents(load_documents(content), rule_id)
+
+
+def check_rule(content):
+    """
+    Validate `content` in a worker process. Returns (documents, None) or
+    (None, error); the documents are plain data, cheap to send back and
+    to compile again, unlike the compiled predicates.
+    """
+    try:
+        docs = load_documents(content)
+        compile_documents(docs)
+        return docs, None
+    except RuleError as e:
+        return None, str(e)
+
+
+class RuleEngine:
+    """
+    Active uploaded rules, evaluated against every alert before it is
+    written.
+
+    Each rule is filed in an index under one equality term of its filter
+    (e.g. evt.Meta.source_ip == '1.2.3.4' -> ("source_ip", "1.2.3.4")), or
+    under its scenario name when it has no filter or one that cannot be
+    checked against an alert. An alert only evaluates
+    the rules filed under its own field values plus the few rules with no
+    usable term, so cost follows the candidate rules, not the rule count.
+    Leaky rules fire when their bucket for the alert's groupby value
+    overflows, then stay silent for `blackhole`. Ids of the rules that
+    fired are stored on the alert as `rule_ids`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = {}  # rule id -> [CompiledRule]
+        self._index = {}  # (field, value) -> [CompiledRule]
+        self._unindexed = []
+        self.evaluated = 0
+        self.matched = 0
+
+    def __len__(self):
+        return sum(len(v) for v in self._rules.values())
+
+    def _rebuild(self):
+        index, unindexed = {}, []
+        for compiled in self._rules.values():
+            for rule in compiled:
+                if not rule.terms:
+                    unindexed.append(rule)
+                    continue
+                # Prefer the term on the most selective field
+                field, values = min(rule.terms, key=lambda t: (len(t[1]), INDEXED_FIELDS.index(t[0])))
+                for value in values:
+                    index.setdefault((field, value), []).append(rule)
+        self._index, self._unindexed = index, unindexed
+
+    def add(self, rule_id, content):
+        """Compile and activate rule `rule_id`; raises RuleError if it does not compile."""
+        compiled = parse_rules(content, rule_id)
+        self.activate({rule_id: compiled})
+        return compiled
+
+    def activate(self, compiled):
+        """Activate already compiled rules ({rule id: [CompiledRule]}) with a single index rebuild."""
+        with self._lock:
+            self._rules.update(compiled)
+            self._rebuild()
+
+    def load(self, rows):
+        """Activate stored rules ({id, content} rows), skipping ones that do not compile."""
+        loaded = {}
+        for row in rows:
+            try:
+                loaded[row["id"]] = parse_rules(row.get("content") or "", row["id"])
+            except RuleError as e:
+                logger.warning(f"⚠ Rule {row.get('id')} ({row.get('name')}) not active: {e}")
+        self.activate(loaded)
+        logger.info(f"📜 {len(loaded)} rules active")
+        return len(loaded)
+
+    def match(self, row, now=None):
+        """Ids of the active rules that fire for `row` (sorted, unique)."""
+        ts = parse_ts(row.get("timestamp"))
+        now = ts.timestamp() if ts else (now or time.time())
+        with self._lock:
+            candidates = list(self._unindexed)
+            for field in INDEXED_FIELDS:
+                value = row.get(field)
+                if value is not None:
+                    candidates.extend(self._index.get((field, value), ()))
+            fired = set()
+            for rule in candidates:
+                self.evaluated += 1
+                try:
+                    hit = rule.predicate(row)
+                except Exception:
+                    hit = False
+                if hit and rule.fire(row, now):
+                    fired.add(rule.id)
+            self.matched += len(fired)
+        return sorted(fired, key=str)
+
+    def annotate(self, rows):
+        """
+        Set `rule_ids` ("3,7" or None) on each row in place; returns the rows.
+        Feeds the leaky buckets: only pass rows that are new (see insert_alerts).
+        """
+        for row in rows:
+            ids = self.match(row)
+            row["rule_ids"] = ",".join(str(i) for i in ids) if ids else None
+        return rows
+
+    def stats(self):
+        return {
+            "rules": len(self._rules),
+            "scenarios": len(self),
+            "index_keys": len(self._index),
+            "unindexed": len(self._unindexed),
+            "by_name": sum(1 for c in self._rules.values() for r in c if r.fallback),
+            "evaluated": self.evaluated,
+            "matched": self.matched,
+        }
+
+
+def insert_alerts(store, engine, rows):
+    """
+    Insert rows, then match only the newly stored ones and record their
+    rule_ids: a re-sent alert is not a new event and must not advance a
+    leaky bucket again. Returns the inserted rows, annotated. Blocking.
+
+    The rows are stored once insert() returns: a failure to record their
+    rule_ids is logged, not raised, or the retried batch would find every
+    row already stored and publish none of them.
+    """
+    inserted = store.insert(rows)
+    engine.annotate(inserted)
+    try:
+        store.set_rule_ids(inserted)
+    except Exception as e:
+        logger.error(f"❌ rule_ids of {len(inserted)} alerts not stored: {e}")
+    return inserted
+
+
+_engine = None
+
+
+def get_rule_engine():
+    """Process-wide rule engine (rules are loaded by the app at startup)."""
+    global _engine
+    if _engine is None:
+        _engine = RuleEngine()
+    return _engine
@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import posixpath
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from rule_engine import check_rule, compile_documents
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Rule import config
+# -------------------------------
+RULES_IMPORT_MAX_FILES = int(os.getenv("RULES_IMPORT_MAX_FILES", "5000"))
+# Uncompressed bytes read from one archive, across all its rule files
+RULES_IMPORT_MAX_BYTES = int(os.getenv("RULES_IMPORT_MAX_BYTES", str(64 * 1024 * 1024)))
+RULES_IMPORT_WORKERS = int(os.getenv("RULES_IMPORT_WORKERS", str(min(os.cpu_count() or 1, 8))))
+
+RULE_SUFFIXES = (".yaml", ".yml")
+
+
+class ArchiveError(ValueError):
+    """The upload is not a readable rule pack."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_import_pool():
+    """Process pool that validates rule files; started on first import."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: never fork the server with its threads and open connections
+            _pool = ProcessPoolExecutor(RULES_IMPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def close_import_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _read_bounded(f, limit):
+    data = f.read(limit + 1)
+    return data if len(data) <= limit else None
+
+
+def read_archive(fileobj, max_file_bytes, max_files=RULES_IMPORT_MAX_FILES, max_bytes=RULES_IMPORT_MAX_BYTES):
+    """
+    Yield (path, bytes or None, reason) for each file in a zip or tar
+    (optionally gzip/bz2/xz) archive. Tars are read as a stream, one
+    member at a time. Files that are not YAML, hidden, or larger than
+    `max_file_bytes` come back without content and with the reason.
+    """
+    try:
+        is_zip = zipfile.is_zipfile(fileobj)
+        fileobj.seek(0)
+        if is_zip:
+            archive = zipfile.ZipFile(fileobj)
+            members = ((i.filename, i.file_size, lambda i=i: archive.open(i))
+                       for i in archive.infolist() if not i.is_dir())
+        else:
+            archive = tarfile.open(fileobj=fileobj, mode="r|*")
+            members = ((m.name, m.size, lambda m=m: archive.extractfile(m))
+                       for m in archive if m.isfile())
+    except (tarfile.TarError, zipfile.BadZipFile) as e:
+        raise ArchiveError(f"Not a zip or tar archive: {e}")
+
+    count, total = 0, 0
+    with archive:
+        try:
+            for path, size, open_member in members:
+                count += 1
+                if count > max_files:
+                    raise ArchiveError(f"Archive has more than {max_files} files")
+                base = posixpath.basename(path)
+                if base.startswith(".") or "__MACOSX/" in path:
+                    yield path, None, "hidden file"
+                    continue
+                if not base.lower().endswith(RULE_SUFFIXES):
+                    yield path, None, "not a YAML file"
+                    continue
+                if size > max_file_bytes:
+                    yield path, None, f"larger than {max_file_bytes} bytes"
+                    continue
+                with open_member() as f:
+                    # Declared sizes can lie; never read past the cap
+                    data = _read_bounded(f, max_file_bytes)
+                if data is None:
+                    yield path, None, f"larger than {max_file_bytes} bytes"
+                    continue
+                total += len(data)
+                if total > max_bytes:
+                    raise ArchiveError(f"Archive expands to more than {max_bytes} bytes")
+                yield path, data, None
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError, OSError) as e:
+            raise ArchiveError(f"Corrupt archive: {e}")
+
+
+def _validate(contents, workers=RULES_IMPORT_WORKERS):
+    """check_rule() over `contents`, in the process pool when there is enough to share out."""
+    if workers <= 1 or len(contents) < 2 * workers:
+        return [check_rule(c) for c in contents]
+    chunksize = max(1, len(contents) // (workers * 4))
+    return list(get_import_pool().map(check_rule, contents, chunksize=chunksize))
+
+
+def import_rules(store, engine, fileobj, max_file_bytes, tags=None, index=None):
+    """
+    Import every rule file of an archive (blocking). Files are hashed and
+    checked against stored rules first, validated in parallel, written in
+    batched transactions and activated with a single index rebuild; new
+    rules are added to the search `index` when one is given.
+    Returns a summary and one report entry per file, in archive order.
+    """
+    report, pending, first_of = [], [], {}
+    for path, data, reason in read_archive(fileobj, max_file_bytes):
+        entry = {"file": path}
+        report.append(entry)
+        if data is None:
+            entry.update(status="skipped", error=reason)
+            continue
+        content_hash = hashlib.sha256(data).hexdigest()
+        entry["content_hash"] = content_hash
+        if content_hash in first_of:
+            entry.update(status="duplicate", duplicate_of=first_of[content_hash]["file"])
+            continue
+        first_of[content_hash] = entry
+        pending.append((entry, data.decode("utf-8", errors="replace")))
+
+    existing = store.by_hashes(first_of) if first_of else {}
+    fresh = []
+    for entry, content in pending:
+        stored = existing.get(entry["content_hash"])
+        if stored:
+            entry.update(status="duplicate", id=stored.get("id"))
+        else:
+            fresh.append((entry, content))
+
+    rows, docs_of = [], []
+    now = datetime.now(timezone.utc).isoformat()
+    for (entry, content), (docs, error) in zip(fresh, _validate([c for _, c in fresh])):
+        if error:
+            entry.update(status="invalid", error=error)
+            continue
+        first = docs[0] if isinstance(docs[0], dict) else {}
+        rows.append({
+            "name": str(first.get("name") or entry["file"]),
+            "description": first.get("description"),
+            "tags": tags,
+            "content": content,
+            "content_hash": entry["content_hash"],
+            "created_at": now,
+        })
+        docs_of.append((entry, docs))
+
+    compiled = {}
+    for (entry, docs), (saved, created) in zip(docs_of, store.insert_many(rows)):
+        entry.update(status="created" if created else "duplicate", id=(saved or {}).get("id"))
+        if created:
+            entry["scenarios"] = len(docs)
+            compiled[saved["id"]] = compile_documents(docs, saved["id"])
+            if index is not None:
+                index.add(saved)
+    if compiled:
+        engine.activate(compiled)
+
+    # Later copies inside the archive point at their first file's rule
+    for entry in report:
+        if "duplicate_of" in entry:
+            entry["id"] = first_of[entry["content_hash"]].get("id")
+
+    summary = {}
+    for entry in report:
+        summary[entry["status"]] = summary.get(entry["status"], 0) + 1
+    logger.info(f"📦 Rule import: {summary}")
+    return {"files": len(report), "summary": summary, "report": report}
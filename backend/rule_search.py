@@ -0,0 +1,206 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+
+# -------------------------------
+# Search config
+# -------------------------------
+# Weight of a term by the field it appears in
+FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "description": 1.5, "content": 1.0}
+
+TOKEN = re.compile(r"[a-z0-9][a-z0-9_]*")
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text or "").lower())
+
+
+def split_tags(tags):
+    """Tags as stored ("ssh, bruteforce") or as a list, normalised to lower case."""
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return sorted({str(t).strip().lower() for t in tags if str(t).strip()})
+
+
+def parse_query(q):
+    """
+    Split a query into (terms, prefixes, tags): `tag:ssh` filters on a tag,
+    `brute*` matches any term starting with "brute", other words must all
+    appear somewhere in the rule.
+    """
+    terms, prefixes, tags = [], [], []
+    for word in str(q or "").split():
+        if word.lower().startswith("tag:"):
+            tags.extend(split_tags(word[4:]))
+        elif word.endswith("*"):
+            prefixes.extend(tokenize(word[:-1])[-1:])
+            terms.extend(tokenize(word[:-1])[:-1])
+        else:
+            terms.extend(tokenize(word))
+    return terms, prefixes, tags
+
+
+class RuleIndex:
+    """
+    In-memory inverted index over the stored rules' name, description,
+    tags and content, behind /rules/search.
+
+    Each term maps to {rule id: weight}, the weight summing FIELD_WEIGHTS
+    over the fields the term occurs in; tags have their own term -> ids
+    map. A sorted vocabulary serves prefix queries by bisect, merging the
+    postings of every term in the prefix's range. Every query term must
+    match (AND): the shortest posting list is walked and the others
+    probed, matches are scored by weight x idf and only the
+    requested page is ranked, so a query touches the postings of its own
+    terms however many rules are indexed. Rules are added one
+    at a time as they are uploaded; the content itself is not kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}  # rule id -> stored fields returned with results
+        self._terms_of = {}  # rule id -> its terms, for removal
+        self._postings = {}  # term -> {rule id: weight}
+        self._tags = {}  # tag -> {rule id}
+        self._vocabulary = []  # sorted terms
+        self._weights = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, row):
+        """Index (or re-index) one rule row with id, name, description, tags and content."""
+        with self._lock:
+            for term in self._add(row):
+                insort(self._vocabulary, term)
+
+    def load(self, rows):
+        """Index many rows, sorting the vocabulary once at the end."""
+        with self._lock:
+            new_terms = []
+            for row in rows:
+                new_terms.extend(self._add(row))
+            self._vocabulary = sorted(set(self._vocabulary).union(new_terms))
+        return len(self._docs)
+
+    def _add(self, row):
+        """Index one row; returns the terms it added to the vocabulary."""
+        rule_id = row["id"]
+        weights = {}
+        tags = split_tags(row.get("tags"))
+        for field, weight in FIELD_WEIGHTS.items():
+            text = " ".join(tags) if field == "tags" else row.get(field)
+            for term in set(tokenize(text)):
+                weights[term] = weights.get(term, 0.0) + weight
+        self._remove(rule_id)
+        self._docs[rule_id] = {
+            "id": rule_id,
+            "name": row.get("name"),
+            "description": row.get("description"),
+            "tags": tags,
+            "created_at": row.get("created_at"),
+        }
+        self._terms_of[rule_id] = (tuple(weights), tags)
+        new_terms = []
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                new_terms.append(term)
+            # Few distinct weights: share one float object per value
+            postings[rule_id] = self._weights.setdefault(weight, weight)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(rule_id)
+        return new_terms
+
+    def remove(self, rule_id):
+        with self._lock:
+            self._remove(rule_id)
+
+    def _remove(self, rule_id):
+        if rule_id not in self._docs:
+            return
+        terms, tags = self._terms_of.pop(rule_id)
+        del self._docs[rule_id]
+        for term in terms:
+            postings = self._postings[term]
+            del postings[rule_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+        for tag in tags:
+            ids = self._tags[tag]
+            ids.discard(rule_id)
+            if not ids:
+                del self._tags[tag]
+
+    def _expand(self, prefix):
+        """Postings of all the terms starting with `prefix`, merged keeping each rule's best weight."""
+        lo = bisect_left(self._vocabulary, prefix)
+        hi = bisect_left(self._vocabulary, prefix + "\uffff", lo)
+        if hi - lo == 1:
+            return self._postings[self._vocabulary[lo]]
+        merged = {}
+        for term in self._vocabulary[lo:hi]:
+            for rule_id, weight in self._postings[term].items():
+                if weight > merged.get(rule_id, 0.0):
+                    merged[rule_id] = weight
+        return merged
+
+    def search(self, q="", tags=(), limit=20, offset=0):
+        """Ranked page of rules matching query `q` and all `tags`; returns (total, results)."""
+        terms, prefixes, query_tags = parse_query(q)
+        tags = sorted(set(split_tags(list(tags))) | set(query_tags))
+        with self._lock:
+            n = len(self._docs)
+            # One posting map per query term
+            clauses = [self._postings.get(t, {}) for t in dict.fromkeys(terms)]
+            clauses += [self._expand(p) for p in dict.fromkeys(prefixes)]
+            tag_sets = [self._tags.get(t, set()) for t in tags]
+            if (not clauses and not tag_sets) or not all(clauses) or not all(tag_sets):
+                return 0, []
+
+            # Walk the smallest clause, probing the others
+            clauses.sort(key=len)
+            tag_sets.sort(key=len)
+            ids = clauses[0].keys() if clauses else tag_sets.pop(0)
+            for postings in clauses[1:]:
+                ids = [rule_id for rule_id in ids if rule_id in postings]
+            for other in tag_sets:
+                ids = [rule_id for rule_id in ids if rule_id in other]
+
+            k = offset + limit
+            if not clauses:
+                # Tag filter only: newest first (ids grow with uploads)
+                top = [(0.0, rule_id) for rule_id in heapq.nlargest(k, ids)]
+            else:
+                if len(clauses) == 1:
+                    scores = clauses[0]
+                else:
+                    # idf per clause: rare terms count for more
+                    scores = dict.fromkeys(ids, 0.0)
+                    for postings in clauses:
+                        idf = math.log(1 + n / len(postings))
+                        for rule_id in scores:
+                            scores[rule_id] += idf * postings[rule_id]
+                # nlargest is stable; walking newest-first breaks ties by recency
+                ids = list(ids)
+                top = [(scores[rule_id], rule_id)
+                       for rule_id in heapq.nlargest(k, reversed(ids), key=scores.__getitem__)]
+            results = [{**self._docs[rule_id], "score": round(score, 3)} for score, rule_id in top[offset:]]
+        return len(ids), results
+
+
+_index = None
+
+
+def get_rule_index():
+    """Process-wide search index (filled by the app at startup)."""
+    global _index
+    if _index is None:
+        _index = RuleIndex()
+    return _index
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    Runs blocking maintenance jobs (archive tiering, retention, ...) on a
+    fixed interval inside the app lifespan. Each job runs in a worker
+    thread, one run at a time, and its last report or error is kept for
+    GET /stats/jobs. Jobs added with the same `group` never run at the same
+    time: one waits for the other to finish.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._tasks = []
+        self._groups = {}
+
+    def add(self, name, fn, interval, quiet=False, group=None):
+        """
+        Register `fn()` (blocking, returns a report dict) to run every
+        `interval` seconds. `quiet` jobs only log failures.
+        """
+        self._jobs[name] = {
+            "fn": fn,
+            "quiet": quiet,
+            "group": group,
+            "interval": interval,
+            "runs": 0,
+            "last_run": None,
+            "last_result": None,
+            "last_error": None,
+        }
+
+    async def _loop(self, name):
+        job = self._jobs[name]
+        lock = self._groups.setdefault(job["group"], asyncio.Lock()) if job["group"] else None
+        while True:
+            started = time.monotonic()
+            try:
+                if lock:
+                    async with lock:
+                        result = await asyncio.to_thread(job["fn"])
+                else:
+                    result = await asyncio.to_thread(job["fn"])
+                job["last_result"] = result
+                job["last_error"] = None
+                if not job["quiet"]:
+                    logger.info(f"🧹 Job {name} finished in {time.monotonic() - started:.2f}s: {result}")
+            except Exception as e:
+                job["last_error"] = str(e)
+                logger.error(f"❌ Job {name} failed: {e}")
+            job["runs"] += 1
+            job["last_run"] = datetime.now(timezone.utc).isoformat()
+            await asyncio.sleep(job["interval"])
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._loop(name), name=f"job-{name}") for name in self._jobs]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self):
+        return {
+            name: {k: v for k, v in job.items() if k not in ("fn", "quiet", "group")}
+            for name, job in self._jobs.items()
+        }
@@ -0,0 +1,47 @@
+import os
+
+from dotenv import load_dotenv
+from fastapi import Request
+
+from storage.repositories import AlertStore, RuleStore
+
+load_dotenv()
+
+# -------------------------------
+# Storage config
+# -------------------------------
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/sentinel.db")
+
+
+def create_backend(backend=STORAGE_BACKEND):
+    if backend == "sqlite":
+        from storage.sqlite_store import SQLiteStorage
+
+        return SQLiteStorage(SQLITE_PATH)
+    if backend == "supabase":
+        from db import create_supabase_client
+        from storage.supabase_store import SupabaseStorage
+
+        return SupabaseStorage(create_supabase_client())
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected 'supabase' or 'sqlite')")
+
+
+def create_stores(backend=STORAGE_BACKEND, archive=None):
+    """
+    One backend (one client / connection pool) shared by both repositories.
+    `archive` optionally attaches the cold Parquet tier to the AlertStore.
+    """
+    shared = create_backend(backend)
+    return AlertStore(shared, archive=archive), RuleStore(shared)
+
+
+# -------------------------------
+# FastAPI dependencies
+# -------------------------------
+def get_alert_store(request: Request) -> AlertStore:
+    return request.app.state.alert_store
+
+
+def get_rule_store(request: Request) -> RuleStore:
+    return request.app.state.rule_store
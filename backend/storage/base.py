@@ -0,0 +1,109 @@
+ALERT_COLUMNS = (
+    "id", "event", "source_ip", "severity", "timestamp",
+    # GeoIP enrichment (geoip.py); null when the source IP is unknown
+    "country", "city", "latitude", "longitude", "asn",
+    # Ids of the uploaded rules that fired for the alert, comma-separated (rule_engine.py)
+    "rule_ids",
+)
+
+
+class StorageBackend:
+    """
+    Persistence interface for alerts and rules.
+
+    Implementations are blocking (call them from a worker thread inside
+    async code) and must be safe to use from several threads at once.
+
+    Alert rows are dicts with the ALERT_COLUMNS keys. `filters` passed to
+    fetch_alerts_page may hold:
+      severity   list of severities (any of)
+      exclude_severity  list of severities to leave out
+      event      scenario name; `*` acts as a wildcard
+      source_ip  exact source IP
+      since      ISO timestamp, inclusive
+      until      ISO timestamp, exclusive
+    """
+
+    name = "base"
+    # Errors worth retrying (dropped connections, busy database, ...)
+    transient_errors = ()
+
+    def insert_alerts(self, rows):
+        """Insert rows, ignoring ids that already exist. Returns the rows actually inserted."""
+        raise NotImplementedError
+
+    def fetch_alerts_page(self, columns, filters, cursor, descending, limit):
+        """
+        Up to `limit` rows ordered by (timestamp, id), descending or ascending.
+        `cursor` is an exclusive (timestamp, id) keyset bound or None.
+        """
+        raise NotImplementedError
+
+    def delete_alerts(self, ids):
+        """Delete alerts by id; returns how many were removed."""
+        raise NotImplementedError
+
+    def update_alert_column(self, column, rows):
+        """Set one column (an ALERT_COLUMNS name) of existing alerts from {id, column} rows."""
+        raise NotImplementedError
+
+    def add_alert_rollups(self, rows):
+        """
+        Add {resolution, bucket, event, severity, count} rows onto the rollup
+        table, summing counts for keys that already exist. The add must be
+        atomic in the database (several workers flush into the same rows).
+        """
+        raise NotImplementedError
+
+    def fetch_alert_rollups(self, resolution, since, until, event=None, severity=None):
+        """Rollup rows of one resolution with since <= bucket < until (ISO strings)."""
+        raise NotImplementedError
+
+    def delete_alert_rollups(self, resolution, before):
+        """Drop rollup rows of one resolution with bucket < before; returns how many."""
+        raise NotImplementedError
+
+    def merge_alert_sketches(self, rows):
+        """
+        Merge {hour, event, registers} distinct-count sketch rows into the
+        stored ones: a register-wise max, done atomically in the database.
+        """
+        raise NotImplementedError
+
+    def fetch_alert_sketches(self, since, until, events=None):
+        """Sketch rows with since <= hour < until, optionally for some events only."""
+        raise NotImplementedError
+
+    def delete_alert_sketches(self, before):
+        """Drop sketch rows with hour < before; returns how many."""
+        raise NotImplementedError
+
+    def insert_rule(self, row):
+        """
+        Insert one rule row and return it as stored (including its id), or
+        None when a rule with the same content_hash already exists.
+        """
+        raise NotImplementedError
+
+    def insert_rules(self, rows):
+        """
+        Insert rule rows in one transaction (or request) and return the
+        stored ones; rows whose content_hash already exists are skipped.
+        """
+        raise NotImplementedError
+
+    def fetch_rule_by_hash(self, content_hash, columns):
+        """The rule row with this content_hash, or None."""
+        raise NotImplementedError
+
+    def fetch_rules_by_hashes(self, content_hashes, columns):
+        """Rule rows whose content_hash is in `content_hashes`."""
+        raise NotImplementedError
+
+    def fetch_rules(self, columns):
+        """All rule rows, oldest first."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
@@ -0,0 +1,194 @@
+import logging
+import os
+import time
+
+from classifier import get_classifier
+from sync_cursor import normalize_ts
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Retry config
+# -------------------------------
+STORE_RETRIES = int(os.getenv("STORE_RETRIES", "2"))
+STORE_RETRY_BACKOFF = float(os.getenv("STORE_RETRY_BACKOFF", "0.2"))
+# Rules written per transaction by RuleStore.insert_many()
+RULES_IMPORT_BATCH = int(os.getenv("RULES_IMPORT_BATCH", "200"))
+
+
+def _page_key(row):
+    # Rows stored before timestamps were normalised may still be in another form
+    return normalize_ts(row["timestamp"]), row["id"]
+
+
+class _Repository:
+    def __init__(self, backend, retries=STORE_RETRIES, backoff=STORE_RETRY_BACKOFF):
+        self.backend = backend
+        self.retries = retries
+        self.backoff = backoff
+
+    def _call(self, fn, *args, retry=True):
+        """Run a backend call, retrying transient errors with exponential backoff."""
+        attempts = self.retries + 1 if retry else 1
+        for attempt in range(attempts):
+            try:
+                return fn(*args)
+            except self.backend.transient_errors as e:
+                if attempt == attempts - 1:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"⚠ {self.backend.name} call failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def close(self):
+        self.backend.close()
+
+
+class AlertStore(_Repository):
+    """
+    Alert persistence. Blocking; call from a worker thread in async code.
+
+    With an `archive` (archive.AlertArchive) attached, page() transparently
+    merges rows that were tiered out of the primary store.
+    """
+
+    def __init__(self, backend, archive=None, **kwargs):
+        super().__init__(backend, **kwargs)
+        self.archive = archive
+
+    def insert(self, rows):
+        """
+        Insert rows, skipping existing ids; returns the newly inserted rows.
+        Severities are stored resolved (classifier.SeverityClassifier.resolve),
+        whichever path wrote the row, so clients only display them; timestamps
+        in the fixed form the archive keeps too (sync_cursor.normalize_ts).
+        """
+        if not rows:
+            return []
+        classifier = get_classifier()
+        for row in rows:
+            row["severity"] = classifier.resolve(row.get("event"), row.get("severity"))
+            row["timestamp"] = normalize_ts(row.get("timestamp"))
+        # Conflict-ignore inserts are idempotent, so retries are safe
+        return self._call(self.backend.insert_alerts, rows)
+
+    def page(self, columns, filters, cursor, descending, limit, include_archive=True):
+        # Bounds and cursors compare as strings against stored timestamps
+        filters = {**filters}
+        for key in ("since", "until"):
+            if filters.get(key):
+                filters[key] = normalize_ts(filters[key])
+        if cursor:
+            cursor = (normalize_ts(cursor[0]), cursor[1])
+        rows = self._call(self.backend.fetch_alerts_page, columns, filters, cursor, descending, limit)
+        if not include_archive or self.archive is None:
+            return rows
+
+        horizon = self.archive.horizon()
+        if horizon is None:
+            return rows
+        # A full newest-first page that ends after the newest archived day cannot
+        # be affected by the archive, which is the common dashboard case
+        if descending and len(rows) >= limit and _page_key(rows[-1])[0] >= normalize_ts(horizon):
+            return rows
+
+        archived = self.archive.scan(columns, filters, cursor, descending, limit)
+        merged, seen = [], set()
+        for row in sorted(rows + archived, key=_page_key, reverse=descending):
+            if row["id"] not in seen:
+                seen.add(row["id"])
+                merged.append(row)
+        return merged[:limit]
+
+    def delete(self, ids):
+        """Delete alerts by id (idempotent, so retried like inserts)."""
+        if not ids:
+            return 0
+        return self._call(self.backend.delete_alerts, ids)
+
+    def set_severities(self, rows):
+        """Rewrite alert severities from {id, severity} rows (idempotent, so retried)."""
+        if rows:
+            self._call(self.backend.update_alert_column, "severity", rows)
+
+    def set_rule_ids(self, rows):
+        """Record the rule_ids of alerts that matched rules; rows without any are skipped."""
+        rows = [{"id": r["id"], "rule_ids": r["rule_ids"]} for r in rows if r.get("rule_ids")]
+        if rows:
+            self._call(self.backend.update_alert_column, "rule_ids", rows)
+
+    def add_rollups(self, rows):
+        # Counts are added, so a retried write could double them: no retry
+        if rows:
+            self._call(self.backend.add_alert_rollups, rows, retry=False)
+
+    def rollups(self, resolution, since, until, event=None, severity=None):
+        return self._call(self.backend.fetch_alert_rollups, resolution, since, until, event, severity)
+
+    def delete_rollups(self, resolution, before):
+        return self._call(self.backend.delete_alert_rollups, resolution, before)
+
+    def sketches(self, since, until, events=None):
+        return self._call(self.backend.fetch_alert_sketches, since, until, events)
+
+    def merge_sketches(self, rows):
+        # A max over registers is idempotent, so retries are safe
+        if rows:
+            self._call(self.backend.merge_alert_sketches, rows)
+
+    def delete_sketches(self, before):
+        return self._call(self.backend.delete_alert_sketches, before)
+
+
+class RuleStore(_Repository):
+    """Rule persistence. Blocking; call from a worker thread in async code."""
+
+    def by_hash(self, content_hash, columns=("id", "name", "created_at")):
+        return self._call(self.backend.fetch_rule_by_hash, content_hash, list(columns))
+
+    def insert(self, row):
+        """
+        Store a rule keyed by its content_hash. Returns (stored row, created);
+        identical content returns the existing rule with created=False.
+        """
+        existing = self.by_hash(row["content_hash"])
+        if existing:
+            return existing, False
+        # Conflict-ignore on content_hash makes a retried insert harmless
+        saved = self._call(self.backend.insert_rule, row)
+        if saved is None:
+            # Lost a race with an identical upload
+            return self.by_hash(row["content_hash"]), False
+        return saved, True
+
+    def by_hashes(self, content_hashes, columns=("id", "name", "created_at", "content_hash")):
+        """Stored rules keyed by content_hash, for the hashes that exist."""
+        rows = self._call(self.backend.fetch_rules_by_hashes, list(content_hashes), list(columns))
+        return {r["content_hash"]: r for r in rows}
+
+    def insert_many(self, rows):
+        """
+        Store many rules, one transaction per RULES_IMPORT_BATCH rows.
+        Returns one (stored row, created) per input row, in order; repeated
+        content only creates its first row.
+        """
+        results = []
+        for start in range(0, len(rows), RULES_IMPORT_BATCH):
+            chunk = rows[start:start + RULES_IMPORT_BATCH]
+            unique = {}
+            for row in chunk:
+                unique.setdefault(row["content_hash"], row)
+            saved = {r["content_hash"]: r for r in self._call(self.backend.insert_rules, list(unique.values()))}
+            # The rest were already stored (possibly by a concurrent import)
+            existing = self.by_hashes([h for h in unique if h not in saved])
+            for row in chunk:
+                h = row["content_hash"]
+                if h in saved:
+                    results.append((saved.pop(h), True))
+                    existing[h] = results[-1][0]
+                else:
+                    results.append((existing.get(h), False))
+        return results
+
+    def all(self, columns=("id", "name", "content")):
+        return self._call(self.backend.fetch_rules, list(columns))
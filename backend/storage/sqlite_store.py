@@ -0,0 +1,291 @@
+import base64
+import logging
+import os
+import sqlite3
+import threading
+
+from storage.base import ALERT_COLUMNS, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id        TEXT PRIMARY KEY,
+    event     TEXT NOT NULL,
+    source_ip TEXT NOT NULL,
+    severity  TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    country   TEXT,
+    city      TEXT,
+    latitude  REAL,
+    longitude REAL,
+    asn       INTEGER,
+    rule_ids  TEXT
+);
+CREATE INDEX IF NOT EXISTS alerts_timestamp_id ON alerts (timestamp, id);
+CREATE TABLE IF NOT EXISTS alert_rollups (
+    resolution TEXT NOT NULL,
+    bucket     TEXT NOT NULL,
+    event      TEXT NOT NULL,
+    severity   TEXT NOT NULL,
+    count      INTEGER NOT NULL,
+    PRIMARY KEY (resolution, bucket, event, severity)
+);
+CREATE TABLE IF NOT EXISTS alert_sketches (
+    hour      TEXT NOT NULL,
+    event     TEXT NOT NULL,
+    registers TEXT NOT NULL,
+    PRIMARY KEY (hour, event)
+);
+CREATE TABLE IF NOT EXISTS rules (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    name        TEXT NOT NULL,
+    description TEXT,
+    tags        TEXT,
+    content     TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    content_hash TEXT
+);
+"""
+
+# Fixed statement text so sqlite3's statement cache reuses the prepared form
+INSERT_ALERT = (
+    f"INSERT INTO alerts ({', '.join(ALERT_COLUMNS)}) "
+    f"VALUES ({', '.join(':' + c for c in ALERT_COLUMNS)}) "
+    "ON CONFLICT (id) DO NOTHING"
+)
+# Columns added after the first release, with their types, for older files
+ADDED_COLUMNS = {
+    "alerts": {
+        "country": "TEXT", "city": "TEXT", "latitude": "REAL", "longitude": "REAL", "asn": "INTEGER",
+        "rule_ids": "TEXT",
+    },
+    "rules": {"content_hash": "TEXT"},
+}
+# Indexes on added columns, created once the columns exist
+ADDED_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS rules_content_hash ON rules (content_hash);
+"""
+ADD_ROLLUP = (
+    "INSERT INTO alert_rollups (resolution, bucket, event, severity, count) "
+    "VALUES (:resolution, :bucket, :event, :severity, :count) "
+    "ON CONFLICT (resolution, bucket, event, severity) DO UPDATE SET count = count + excluded.count"
+)
+# Register-wise max inside the upsert, so concurrent writers never lose registers
+MERGE_SKETCH = (
+    "INSERT INTO alert_sketches (hour, event, registers) VALUES (:hour, :event, :registers) "
+    "ON CONFLICT (hour, event) DO UPDATE SET registers = hll_max(registers, excluded.registers)"
+)
+RULE_COLUMNS = ("name", "description", "tags", "content", "created_at", "content_hash")
+INSERT_RULE = (
+    "INSERT INTO rules (name, description, tags, content, created_at, content_hash) "
+    "VALUES (:name, :description, :tags, :content, :created_at, :content_hash) "
+    "ON CONFLICT (content_hash) DO NOTHING"
+)
+
+
+def _hll_max(a, b):
+    """SQL function: register-wise max of two base64 HyperLogLog sketches."""
+    a, b = base64.b64decode(a), base64.b64decode(b)
+    if len(a) != len(b):
+        raise ValueError("Cannot merge sketches of different precision")
+    return base64.b64encode(bytes(map(max, a, b))).decode()
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Embedded store for running (and benchmarking) without a Supabase project.
+
+    WAL journal so readers never block the writer, one connection per
+    thread, and each insert_alerts() call is a single transaction.
+    """
+
+    name = "sqlite"
+    transient_errors = (sqlite3.OperationalError,)
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        with conn:
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+                for column, kind in columns.items():
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+        conn.executescript(ADDED_INDEXES)
+        logger.info(f"🗄 SQLite store at {path}")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=64)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.create_function("hll_max", 2, _hll_max, deterministic=True)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def insert_alerts(self, rows):
+        conn = self._conn()
+        inserted = []
+        with conn:
+            for row in rows:
+                if conn.execute(INSERT_ALERT, {c: row.get(c) for c in ALERT_COLUMNS}).rowcount:
+                    inserted.append(row)
+        return inserted
+
+    def fetch_alerts_page(self, columns, filters, cursor, descending, limit):
+        where, params = [], []
+        if filters.get("severity"):
+            where.append(f"severity IN ({','.join('?' * len(filters['severity']))})")
+            params.extend(filters["severity"])
+        if filters.get("exclude_severity"):
+            where.append(f"severity NOT IN ({','.join('?' * len(filters['exclude_severity']))})")
+            params.extend(filters["exclude_severity"])
+        event = filters.get("event")
+        if event:
+            if "*" in event:
+                where.append("event LIKE ?")
+                params.append(event.replace("*", "%"))
+            else:
+                where.append("event = ?")
+                params.append(event)
+        if filters.get("source_ip"):
+            where.append("source_ip = ?")
+            params.append(filters["source_ip"])
+        if filters.get("since"):
+            where.append("timestamp >= ?")
+            params.append(filters["since"])
+        if filters.get("until"):
+            where.append("timestamp < ?")
+            params.append(filters["until"])
+        if cursor:
+            where.append(f"(timestamp, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(cursor)
+
+        order = "DESC" if descending else "ASC"
+        sql = (
+            f"SELECT {', '.join(columns)} FROM alerts"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + f" ORDER BY timestamp {order}, id {order} LIMIT ?"
+        )
+        params.append(limit)
+        return [dict(r) for r in self._conn().execute(sql, params)]
+
+    def delete_alerts(self, ids):
+        conn = self._conn()
+        deleted = 0
+        with conn:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                deleted += conn.execute(
+                    f"DELETE FROM alerts WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).rowcount
+        return deleted
+
+    def update_alert_column(self, column, rows):
+        if column not in ALERT_COLUMNS:
+            raise ValueError(f"Unknown alert column {column!r}")
+        conn = self._conn()
+        with conn:
+            conn.executemany(f"UPDATE alerts SET {column} = :{column} WHERE id = :id", rows)
+
+    def add_alert_rollups(self, rows):
+        conn = self._conn()
+        with conn:
+            conn.executemany(ADD_ROLLUP, rows)
+
+    def fetch_alert_rollups(self, resolution, since, until, event=None, severity=None):
+        where, params = ["resolution = ?", "bucket >= ?", "bucket < ?"], [resolution, since, until]
+        if event:
+            where.append("event = ?")
+            params.append(event)
+        if severity:
+            where.append(f"severity IN ({','.join('?' * len(severity))})")
+            params.extend(severity)
+        cur = self._conn().execute(
+            "SELECT bucket, event, severity, count FROM alert_rollups WHERE "
+            + " AND ".join(where) + " ORDER BY bucket",
+            params,
+        )
+        return [dict(r) for r in cur]
+
+    def delete_alert_rollups(self, resolution, before):
+        conn = self._conn()
+        with conn:
+            return conn.execute(
+                "DELETE FROM alert_rollups WHERE resolution = ? AND bucket < ?", (resolution, before)
+            ).rowcount
+
+    def merge_alert_sketches(self, rows):
+        conn = self._conn()
+        with conn:
+            conn.executemany(MERGE_SKETCH, rows)
+
+    def fetch_alert_sketches(self, since, until, events=None):
+        sql = "SELECT hour, event, registers FROM alert_sketches WHERE hour >= ? AND hour < ?"
+        params = [since, until]
+        if events:
+            sql += f" AND event IN ({','.join('?' * len(events))})"
+            params.extend(events)
+        return [dict(r) for r in self._conn().execute(sql, params)]
+
+    def delete_alert_sketches(self, before):
+        conn = self._conn()
+        with conn:
+            return conn.execute("DELETE FROM alert_sketches WHERE hour < ?", (before,)).rowcount
+
+    def insert_rule(self, row):
+        inserted = self.insert_rules([row])
+        return inserted[0] if inserted else None
+
+    def insert_rules(self, rows):
+        conn = self._conn()
+        inserted = []
+        with conn:
+            for row in rows:
+                cur = conn.execute(INSERT_RULE, {k: row.get(k) for k in RULE_COLUMNS})
+                if cur.rowcount:
+                    inserted.append({**row, "id": cur.lastrowid})
+        return inserted
+
+    def fetch_rule_by_hash(self, content_hash, columns):
+        cur = self._conn().execute(
+            f"SELECT {', '.join(columns)} FROM rules WHERE content_hash = ?", (content_hash,)
+        )
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+    def fetch_rules_by_hashes(self, content_hashes, columns):
+        conn = self._conn()
+        rows = []
+        for start in range(0, len(content_hashes), 500):
+            chunk = content_hashes[start:start + 500]
+            rows.extend(dict(r) for r in conn.execute(
+                f"SELECT {', '.join(columns)} FROM rules "
+                f"WHERE content_hash IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return rows
+
+    def fetch_rules(self, columns):
+        cur = self._conn().execute(f"SELECT {', '.join(columns)} FROM rules ORDER BY id")
+        return [dict(r) for r in cur]
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
@@ -0,0 +1,254 @@
+import os
+
+import httpx
+
+from storage.base import StorageBackend
+
+# Rows per upsert request
+SUPABASE_BATCH_SIZE = int(os.getenv("ALERTS_BATCH_SIZE", "500"))
+# Ids per delete request (they travel in the query string)
+SUPABASE_DELETE_CHUNK = 200
+
+# PostgREST cannot add to a column in an upsert; this function does the add
+# inside Postgres, atomically, however many workers flush at once
+ADD_ROLLUPS_SQL = """
+create or replace function add_alert_rollups(rows jsonb) returns void
+language sql as $$
+  insert into alert_rollups (resolution, bucket, event, severity, count)
+  select resolution, bucket, event, severity, sum(count)
+  from jsonb_to_recordset(rows)
+    as r(resolution text, bucket text, event text, severity text, count bigint)
+  group by resolution, bucket, event, severity
+  on conflict (bucket, resolution, event, severity)
+  do update set count = alert_rollups.count + excluded.count;
+$$;
+"""
+# Same for sketches: the register-wise max of two base64 HyperLogLogs runs in
+# Postgres, inside the upsert
+MERGE_SKETCHES_SQL = """
+create or replace function hll_max(a text, b text) returns text
+language sql immutable as $$
+  select translate(encode(string_agg(
+           set_byte('\\x00'::bytea, 0, greatest(get_byte(x, i), get_byte(y, i))),
+           ''::bytea order by i), 'base64'), E'\\n', '')
+  from (select decode(a, 'base64') as x, decode(b, 'base64') as y) s,
+       generate_series(0, length(x) - 1) as i
+$$;
+
+create or replace function merge_alert_sketches(rows jsonb) returns void
+language sql as $$
+  insert into alert_sketches (hour, event, registers)
+  select hour, event, registers
+  from jsonb_to_recordset(rows) as r(hour text, event text, registers text)
+  on conflict (hour, event)
+  do update set registers = hll_max(alert_sketches.registers, excluded.registers);
+$$;
+"""
+
+
+def _quote(value):
+    # PostgREST reserved characters (, . : ( )) must be double-quoted in or= filters
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+class SupabaseStorage(StorageBackend):
+    """
+    Alerts and rules in the hosted Supabase (PostgREST) tables. The alerts
+    table needs the GeoIP columns (country text, city text, latitude and
+    longitude float8, asn int8) and rule_ids text next to the original five;
+    rules a unique `content_hash` text column. Rollups need an
+    `alert_rollups` table (resolution, bucket, event, severity, count) with
+    a unique key on (bucket, resolution, event, severity) and the
+    add_alert_rollups function from ADD_ROLLUPS_SQL; distinct-count
+    sketches an `alert_sketches` table (hour, event, registers) with a
+    unique key on (hour, event) and the functions from MERGE_SKETCHES_SQL.
+    """
+
+    name = "supabase"
+    transient_errors = (httpx.TransportError,)
+
+    def __init__(self, client, batch_size=SUPABASE_BATCH_SIZE):
+        self.client = client
+        self.batch_size = batch_size
+
+    def insert_alerts(self, rows):
+        # Upsert with ignore_duplicates: PostgREST returns only the new rows
+        inserted = []
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            res = (
+                self.client.table("alerts")
+                .upsert(chunk, on_conflict="id", ignore_duplicates=True)
+                .execute()
+            )
+            inserted.extend(res.data or [])
+        return inserted
+
+    def fetch_alerts_page(self, columns, filters, cursor, descending, limit):
+        query = self.client.table("alerts").select(",".join(columns))
+
+        if filters.get("severity"):
+            query = query.in_("severity", filters["severity"])
+        if filters.get("exclude_severity"):
+            query = query.not_.in_("severity", filters["exclude_severity"])
+        event = filters.get("event")
+        if event:
+            query = query.ilike("event", event.replace("*", "%")) if "*" in event else query.eq("event", event)
+        if filters.get("source_ip"):
+            query = query.eq("source_ip", filters["source_ip"])
+        if filters.get("since"):
+            query = query.gte("timestamp", filters["since"])
+        if filters.get("until"):
+            query = query.lt("timestamp", filters["until"])
+
+        if cursor:
+            ts, alert_id = cursor
+            op = "lt" if descending else "gt"
+            query = query.or_(
+                f"timestamp.{op}.{_quote(ts)},and(timestamp.eq.{_quote(ts)},id.{op}.{_quote(alert_id)})"
+            )
+
+        res = (
+            query.order("timestamp", desc=descending)
+            .order("id", desc=descending)
+            .limit(limit)
+            .execute()
+        )
+        return res.data or []
+
+    def delete_alerts(self, ids):
+        deleted = 0
+        for start in range(0, len(ids), SUPABASE_DELETE_CHUNK):
+            chunk = ids[start:start + SUPABASE_DELETE_CHUNK]
+            res = self.client.table("alerts").delete().in_("id", chunk).execute()
+            deleted += len(res.data or [])
+        return deleted
+
+    def update_alert_column(self, column, rows):
+        # One PATCH per distinct value, ids chunked like deletes
+        ids_of = {}
+        for row in rows:
+            ids_of.setdefault(row[column], []).append(row["id"])
+        for value, ids in ids_of.items():
+            for start in range(0, len(ids), SUPABASE_DELETE_CHUNK):
+                self.client.table("alerts").update({column: value}).in_(
+                    "id", ids[start:start + SUPABASE_DELETE_CHUNK]
+                ).execute()
+
+    def _select_all(self, build):
+        """
+        Every row of a select built by `build()`, fetched batch_size rows at a
+        time: PostgREST silently caps one response at its max-rows setting.
+        """
+        rows, start = [], 0
+        while True:
+            data = build().range(start, start + self.batch_size - 1).execute().data or []
+            rows.extend(data)
+            if len(data) < self.batch_size:
+                return rows
+            start += self.batch_size
+
+    def add_alert_rollups(self, rows):
+        for start in range(0, len(rows), self.batch_size):
+            self.client.rpc("add_alert_rollups", {"rows": rows[start:start + self.batch_size]}).execute()
+
+    def fetch_alert_rollups(self, resolution, since, until, event=None, severity=None):
+        def build():
+            query = (
+                self.client.table("alert_rollups")
+                .select("bucket,event,severity,count")
+                .eq("resolution", resolution)
+                .gte("bucket", since)
+                .lt("bucket", until)
+            )
+            if event:
+                query = query.eq("event", event)
+            if severity:
+                query = query.in_("severity", severity)
+            return query.order("bucket").order("event").order("severity")
+
+        return self._select_all(build)
+
+    def delete_alert_rollups(self, resolution, before):
+        res = (
+            self.client.table("alert_rollups")
+            .delete()
+            .eq("resolution", resolution)
+            .lt("bucket", before)
+            .execute()
+        )
+        return len(res.data or [])
+
+    def merge_alert_sketches(self, rows):
+        for start in range(0, len(rows), self.batch_size):
+            self.client.rpc("merge_alert_sketches", {"rows": rows[start:start + self.batch_size]}).execute()
+
+    def fetch_alert_sketches(self, since, until, events=None):
+        def build():
+            query = (
+                self.client.table("alert_sketches")
+                .select("hour,event,registers")
+                .gte("hour", since)
+                .lt("hour", until)
+            )
+            if events:
+                query = query.in_("event", events)
+            return query.order("hour").order("event")
+
+        return self._select_all(build)
+
+    def delete_alert_sketches(self, before):
+        res = self.client.table("alert_sketches").delete().lt("hour", before).execute()
+        return len(res.data or [])
+
+    def insert_rule(self, row):
+        # ignore_duplicates on the unique content_hash: an existing rule comes back empty
+        res = (
+            self.client.table("rules")
+            .upsert(row, on_conflict="content_hash", ignore_duplicates=True)
+            .execute()
+        )
+        return (res.data or [None])[0]
+
+    def fetch_rule_by_hash(self, content_hash, columns):
+        res = (
+            self.client.table("rules")
+            .select(",".join(columns))
+            .eq("content_hash", content_hash)
+            .limit(1)
+            .execute()
+        )
+        return (res.data or [None])[0]
+
+    def insert_rules(self, rows):
+        inserted = []
+        for start in range(0, len(rows), self.batch_size):
+            res = (
+                self.client.table("rules")
+                .upsert(rows[start:start + self.batch_size], on_conflict="content_hash",
+                        ignore_duplicates=True)
+                .execute()
+            )
+            inserted.extend(res.data or [])
+        return inserted
+
+    def fetch_rules_by_hashes(self, content_hashes, columns):
+        rows = []
+        # Hashes travel in the query string; keep each request's URL short
+        for start in range(0, len(content_hashes), SUPABASE_DELETE_CHUNK):
+            res = (
+                self.client.table("rules")
+                .select(",".join(columns))
+                .in_("content_hash", content_hashes[start:start + SUPABASE_DELETE_CHUNK])
+                .execute()
+            )
+            rows.extend(res.data or [])
+        return rows
+
+    def fetch_rules(self, columns):
+        return self._select_all(lambda: self.client.table("rules").select(",".join(columns)).order("id"))
+
+    def close(self):
+        http = self.client.options.httpx_client
+        if http is not None:
+            http.close()
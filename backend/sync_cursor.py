@@ -0,0 +1,108 @@
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+# -------------------------------
+# Cursor config
+# -------------------------------
+SYNC_CURSOR_FILE = os.getenv("SYNC_CURSOR_FILE", "state/sync_cursor.json")
+
+_FRACTION = re.compile(r"\.(\d+)")
+
+
+def parse_ts(value):
+    """Parse a LAPI timestamp (RFC 3339, possibly with nanoseconds) as aware UTC."""
+    if not value:
+        return None
+    try:
+        # datetime only keeps microseconds; LAPI may send nanoseconds
+        value = _FRACTION.sub(lambda m: "." + m.group(1)[:6], str(value), count=1)
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+def normalize_ts(value):
+    """
+    One fixed-width UTC form ("...T12:00:00.000000Z") for stored timestamps,
+    so string order is time order whatever LAPI or the webhook sent ("Z" or
+    "+00:00", with or without fractions). Unparseable values pass through.
+    """
+    ts = parse_ts(value)
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.%fZ") if ts else value
+
+
+def lapi_duration(since_ts, slack=0, round_up=True):
+    """
+    LAPI's `since`/`created_before` filters take a Go duration relative to
+    now, so express `since_ts` as "<seconds>s" ago, widened by `slack`
+    seconds. `since` rounds the age up and `created_before` rounds it down
+    (round_up=False), so either way the window still covers `since_ts`.
+    """
+    age = (datetime.now(timezone.utc) - since_ts).total_seconds() + slack
+    if round_up:
+        return f"{max(1, int(age) + 1)}s"
+    return f"{max(0, int(age))}s"
+
+
+class SyncCursor:
+    """
+    High-water mark of the LAPI sync: newest (created_at, id) pushed so far.
+
+    Checkpointed to SYNC_CURSOR_FILE after every successful push so a
+    restarted sync asks LAPI only for alerts newer than the mark.
+    """
+
+    def __init__(self, path=SYNC_CURSOR_FILE, created_at=None, alert_id=0):
+        self.path = path
+        self.created_at = created_at
+        self.alert_id = alert_id
+
+    @classmethod
+    def load(cls, path=SYNC_CURSOR_FILE):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return cls(path, parse_ts(data.get("created_at")), data.get("id") or 0)
+        except FileNotFoundError:
+            return cls(path)
+        except (ValueError, OSError):
+            # A corrupt checkpoint only costs a full re-read; dedup absorbs it
+            return cls(path)
+
+    def advance(self, alerts):
+        """Move the mark to the newest alert in `alerts`; returns True if it moved."""
+        moved = False
+        for alert in alerts:
+            ts = parse_ts(alert.get("created_at"))
+            if ts is None:
+                continue
+            key = (ts, _int_id(alert.get("id")))
+            if self.created_at is None or key > (self.created_at, self.alert_id):
+                self.created_at, self.alert_id = key
+                moved = True
+        return moved
+
+    def save(self):
+        """Write the checkpoint atomically (temp file + rename)."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "created_at": self.created_at.isoformat() if self.created_at else None,
+                "id": self.alert_id,
+            }, f)
+        os.replace(tmp, self.path)
+
+
+def _int_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
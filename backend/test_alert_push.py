@@ -1,5 +1,3 @@
-import os
-from supabase import create_client
 from datetime import datetime
 import uuid
 from dotenv import load_dotenv
@@ -7,15 +5,10 @@ from dotenv import load_dotenv
 # Load .env file
 load_dotenv()
 
-# Get Supabase credentials
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+from storage import create_stores
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise Exception("Supabase credentials not found in environment variables!")
-
-# Create Supabase client
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Same store layer (and STORAGE_BACKEND) as the app
+alert_store, _ = create_stores()
 
 # Create a fake alert
 alert = {
@@ -26,6 +19,6 @@ alert = {
     "timestamp": datetime.utcnow().isoformat() + "Z"
 }
 
-# Insert into Supabase
-res = supabase.table("alerts").insert(alert).execute()
-print("Inserted test alert:", res.data)
+# Insert into the store
+res = alert_store.insert([alert])
+print("Inserted test alert:", res)
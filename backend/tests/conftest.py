@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the backend's flat modules the way the app does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage.repositories import AlertStore, RuleStore  # noqa: E402
+from storage.sqlite_store import SQLiteStorage  # noqa: E402
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteStorage(str(tmp_path / "sentinel.db"))
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def alert_store(backend):
+    return AlertStore(backend)
+
+
+@pytest.fixture
+def rule_store(backend):
+    return RuleStore(backend)
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from admission import AdmissionController
+from ingest import IngestQueue
+
+
+def rows(n):
+    return [{"id": str(i)} for i in range(n)]
+
+
+def admit(controller, source, batch):
+    asyncio.run(controller.admit(source, batch))
+
+
+def test_admits_onto_the_queue():
+    queue = IngestQueue(lambda batch: batch, maxsize=100)
+    controller = AdmissionController(queue, rate=100, burst=100)
+    admit(controller, "a", rows(10))
+    assert queue.depth() == 10
+    assert controller.counters["admitted"] == 10
+
+
+def test_oversized_payload_is_413():
+    queue = IngestQueue(lambda batch: batch, maxsize=100)
+    controller = AdmissionController(queue, rate=100, burst=50)
+    with pytest.raises(HTTPException) as e:
+        admit(controller, "a", rows(51))
+    assert e.value.status_code == 413
+    assert queue.depth() == 0
+    assert controller.counters["shed_too_large"] == 51
+
+
+def test_rate_limit_is_429_per_source():
+    queue = IngestQueue(lambda batch: batch, maxsize=1000)
+    controller = AdmissionController(queue, rate=1, burst=10)
+    admit(controller, "noisy", rows(10))
+    with pytest.raises(HTTPException) as e:
+        admit(controller, "noisy", rows(5))
+    assert e.value.status_code == 429
+    assert int(e.value.headers["Retry-After"]) >= 1
+    # Another notifier has its own bucket
+    admit(controller, "quiet", rows(5))
+    assert controller.stats()["shed_by_source"] == {"noisy": 5}
+
+
+def test_full_queue_is_503_after_waiting():
+    queue = IngestQueue(lambda batch: batch, maxsize=10)
+    controller = AdmissionController(queue, rate=1000, burst=1000, max_wait=0.05, retry_after=7)
+    admit(controller, "a", rows(8))
+    with pytest.raises(HTTPException) as e:
+        admit(controller, "a", rows(5))
+    assert e.value.status_code == 503
+    assert e.value.headers["Retry-After"] == "7"
+    assert controller.counters["deferred"] == 5
+    assert controller.counters["shed_queue_full"] == 5
+    assert queue.depth() == 8
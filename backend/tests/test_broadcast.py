@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from broadcast import EVICTED, BroadcastHub, HubFull
+
+
+def rows(n):
+    return [{"id": str(i)} for i in range(n)]
+
+
+def test_large_batch_takes_one_slot():
+    async def main():
+        hub = BroadcastHub(buffer=4)
+        sub = hub.subscribe()
+        hub.publish(rows(300))
+        hub.publish([])
+        assert not sub.evicted
+        assert len(await sub.get()) == 300
+        assert sub.queue.empty()
+        return hub.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["published"], stats["evictions"]) == (300, 0)
+
+
+def test_slow_client_is_evicted_without_holding_back_others():
+    async def main():
+        hub = BroadcastHub(buffer=2)
+        slow, fast = hub.subscribe(), hub.subscribe()
+        for _ in range(3):
+            hub.publish(rows(1))
+            assert await fast.get() == [{"id": "0"}]
+        assert slow.evicted and not fast.evicted
+        assert await slow.get() is EVICTED
+        return hub.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["clients"], stats["evictions"]) == (1, 1)
+
+
+def test_client_limit():
+    async def main():
+        hub = BroadcastHub(max_clients=1)
+        hub.subscribe()
+        with pytest.raises(HubFull):
+            hub.subscribe()
+
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from cardinality import ALL_SCENARIOS, DistinctAttackers, HyperLogLog
+
+HOUR = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+
+
+def ips(start, stop):
+    return [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(start, stop)]
+
+
+def rows(addresses, event="ssh-bf", ts=HOUR):
+    return [{"source_ip": ip, "event": event, "timestamp": ts.isoformat()} for ip in addresses]
+
+
+def test_count_is_within_the_standard_error():
+    sketch = HyperLogLog()
+    for ip in ips(0, 20000):
+        sketch.add(ip)
+    assert abs(sketch.count() - 20000) / 20000 < 0.05
+
+
+def test_merge_is_a_union():
+    a, b = HyperLogLog(), HyperLogLog()
+    for ip in ips(0, 3000):
+        a.add(ip)
+    for ip in ips(2000, 5000):
+        b.add(ip)
+    a.merge(b)
+    assert abs(a.count() - 5000) / 5000 < 0.05
+    # Merging again changes nothing
+    registers = bytes(a.registers)
+    a.merge(b)
+    assert bytes(a.registers) == registers
+
+
+def test_round_trips_as_text():
+    sketch = HyperLogLog()
+    for ip in ips(0, 100):
+        sketch.add(ip)
+    assert HyperLogLog.from_text(sketch.to_text()).registers == sketch.registers
+
+
+def test_workers_flushing_the_same_hour_are_max_merged(alert_store):
+    # Two processes saw overlapping attackers in the same hour
+    first, second = DistinctAttackers(alert_store), DistinctAttackers(alert_store)
+    first.update(rows(ips(0, 3000)))
+    second.update(rows(ips(1000, 4000)))
+    first.flush()
+    second.flush()
+    # A retried flush must not inflate the count
+    first._dirty |= set(first._sketches)
+    first.flush()
+
+    reader = DistinctAttackers(alert_store)
+    result = reader.distinct(HOUR, HOUR + timedelta(hours=1), "ssh-bf")
+    assert result["hours"] == 1
+    assert abs(result["distinct"] - 4000) / 4000 < 0.05
+    everything = reader.distinct(HOUR, HOUR + timedelta(hours=1), ALL_SCENARIOS)
+    assert everything["distinct"] == result["distinct"]
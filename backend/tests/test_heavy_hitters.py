@@ -0,0 +1,53 @@
+import random
+import time
+from datetime import datetime, timezone
+
+from heavy_hitters import CountMinSketch, HeavyHitters
+
+
+def alert(ip, epoch=None):
+    ts = datetime.fromtimestamp(epoch or time.time(), timezone.utc)
+    return {"source_ip": ip, "timestamp": ts.isoformat()}
+
+
+def test_sketch_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    truth = {}
+    rng = random.Random(7)
+    for _ in range(5000):
+        key = f"k{rng.randrange(500)}"
+        sketch.add(key)
+        truth[key] = truth.get(key, 0) + 1
+    assert all(sketch.estimate(k) >= n for k, n in truth.items())
+
+
+def test_top_k_finds_the_heavy_hitters_among_noise(tmp_path):
+    hh = HeavyHitters(str(tmp_path / "hh.json"))
+    rng = random.Random(1)
+    rows = [alert(f"10.0.0.{i}") for i in range(1, 6) for _ in range(200 * i)]
+    rows += [alert(f"172.16.{rng.randrange(256)}.{rng.randrange(256)}") for _ in range(5000)]
+    rng.shuffle(rows)
+    hh.update(rows)
+    top = hh.top("5m", 5)
+    assert [ip for ip, _ in top] == [f"10.0.0.{i}" for i in range(5, 0, -1)]
+    # Estimates only err high
+    assert all(count >= 200 * int(ip.rsplit(".", 1)[1]) for ip, count in top)
+    assert [ip for ip, _ in hh.top(None, 5)] == [ip for ip, _ in top]
+
+
+def test_old_alerts_only_count_all_time(tmp_path):
+    hh = HeavyHitters(str(tmp_path / "hh.json"))
+    hh.update([alert("10.0.0.1", time.time() - 2 * 86400)] * 3)
+    assert hh.top("24h") == []
+    assert hh.top(None) == [("10.0.0.1", 3)]
+
+
+def test_snapshot_restores_the_windows(tmp_path):
+    path = str(tmp_path / "hh.json")
+    hh = HeavyHitters(path)
+    hh.update([alert("10.0.0.1")] * 4 + [alert("10.0.0.2")])
+    hh.snapshot()
+    restored = HeavyHitters(path)
+    restored.load()
+    assert restored.top("1h") == hh.top("1h")
+    assert restored.top(None) == hh.top(None)
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from ingest import IngestQueue, add_listener, remove_listener
+
+
+def run(queue, rows):
+    async def main():
+        await queue.start()
+        queue.put_nowait_many(rows)
+        await queue.stop()
+
+    asyncio.run(main())
+
+
+def queue_for(writer, tmp_path, **kwargs):
+    return IngestQueue(
+        writer, workers=1, max_linger=0.01, retry_backoff=0.001,
+        dead_letter_file=str(tmp_path / "dead.jsonl"), **kwargs,
+    )
+
+
+def test_batches_are_written_and_published(tmp_path):
+    published = []
+    add_listener(published.extend)
+    try:
+        queue = queue_for(lambda batch: batch, tmp_path, max_batch=3)
+        run(queue, [{"id": str(i)} for i in range(7)])
+    finally:
+        remove_listener(published.extend)
+    assert [r["id"] for r in published] == [str(i) for i in range(7)]
+    assert queue.stats()["written"] == 7
+
+
+def test_failed_write_is_retried(tmp_path):
+    calls = []
+
+    def flaky(batch):
+        calls.append(len(batch))
+        if len(calls) < 3:
+            raise ConnectionError("store down")
+        return batch
+
+    queue = queue_for(flaky, tmp_path, retries=4)
+    run(queue, [{"id": "a"}, {"id": "b"}])
+    assert len(calls) == 3
+    assert queue.retried == 2
+    assert queue.written == 2
+    assert not (tmp_path / "dead.jsonl").exists()
+
+
+def test_batch_that_keeps_failing_is_dead_lettered_and_replayed(tmp_path):
+    def broken(batch):
+        raise ConnectionError("store down")
+
+    queue = queue_for(broken, tmp_path, retries=1)
+    run(queue, [{"id": "a"}, {"id": "b"}])
+    assert queue.failed == 2
+    lines = (tmp_path / "dead.jsonl").read_text().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["a", "b"]
+
+    # The next start queues them again
+    written = []
+    replay = queue_for(lambda batch: written.extend(batch) or batch, tmp_path)
+
+    async def main():
+        await replay.start()
+        await asyncio.sleep(0.1)
+        await replay.stop()
+
+    asyncio.run(main())
+    assert [r["id"] for r in written] == ["a", "b"]
+    assert replay.replayed == 2
+    assert not (tmp_path / "dead.jsonl").exists()
+    assert not (tmp_path / "dead.jsonl.replay").exists()
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import retention
+import rollups
+from retention import RetentionJob, parse_policy
+from rollups import AlertRollups
+
+NOW = datetime.now(timezone.utc).replace(minute=30, second=0, microsecond=0)
+
+
+def alert(alert_id, days_ago, severity):
+    return {
+        "id": alert_id,
+        "event": "crowdsecurity/ssh-bf",
+        "severity": severity,
+        "source_ip": "10.0.0.1",
+        "timestamp": (NOW - timedelta(days=days_ago)).isoformat(),
+    }
+
+
+def store_counted(alert_store, rollup, rows):
+    """Insert and count rows the way the ingest path does."""
+    rollup.update(alert_store.insert(rows))
+    rollup.flush()
+
+
+def test_policy_normalises_severities_and_defaults():
+    assert parse_policy("high=30, Critical=365") == {"High": 30, "Critical": 365, "default": 90}
+    assert parse_policy("default=7,bogus") == {"default": 7}
+
+
+def test_expired_alerts_are_deleted_per_severity(alert_store):
+    alert_store.insert([
+        alert("crit-old", 200, "Critical"),
+        alert("high-old", 200, "High"),
+        alert("low-old", 100, "Low"),
+        alert("low-new", 10, "Low"),
+    ])
+    job = RetentionJob(alert_store, policy=parse_policy("Critical=365,High=180,default=90"), batch=1)
+    report = job()
+    assert report["removed"] == 2
+    assert report["by_severity"] == {"Critical": 0, "High": 1, "default": 1}
+    kept = alert_store.page(["id"], {}, None, False, 10)
+    assert sorted(r["id"] for r in kept) == ["crit-old", "low-new"]
+
+
+def test_counts_outlive_the_deleted_alerts(alert_store, monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_ENABLED", True)
+    monkeypatch.setattr(retention, "RETENTION_POLICY", "Critical=365,default=90")
+    monkeypatch.setattr(rollups, "ROLLUP_HOUR_RETENTION_DAYS", 30)
+    rollup = AlertRollups(alert_store)
+    store_counted(alert_store, rollup, [alert(f"old-{i}", 200, "Low") for i in range(3)])
+    store_counted(alert_store, rollup, [alert("new", 1, "Low")])
+
+    assert RetentionJob(alert_store)()["removed"] == 3
+    rollup.prune()
+
+    assert alert_store.page(["id"], {}, None, False, 10) == [{"id": "new"}]
+    assert rollup.totals()[("crowdsecurity/ssh-bf", "Low")] == 4
+    hour = (NOW - timedelta(days=200)).replace(minute=0)
+    buckets = rollup.query("hour", hour, hour + timedelta(hours=1))
+    assert [b["count"] for b in buckets] == [3]
+
+
+def test_hour_rollups_are_kept_as_long_as_the_longest_policy(alert_store, monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_HOUR_RETENTION_DAYS", 30)
+    monkeypatch.setattr(retention, "RETENTION_POLICY", "Critical=365,default=90")
+    monkeypatch.setattr(retention, "RETENTION_ENABLED", False)
+    assert AlertRollups(alert_store).retention["hour"] == 30 * 86400
+    monkeypatch.setattr(retention, "RETENTION_ENABLED", True)
+    assert AlertRollups(alert_store).retention["hour"] == 365 * 86400
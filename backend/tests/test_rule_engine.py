@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from rule_engine import RuleEngine, RuleError, insert_alerts, parse_rules
+
+START = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+
+LEAKY = """
+type: leaky
+name: local/ssh-flood
+filter: evt.Meta.source_ip startsWith '10.' && alert.scenario == 'crowdsecurity/ssh-bf'
+groupby: evt.Meta.source_ip
+capacity: 3
+leakspeed: 10s
+blackhole: 1m
+"""
+
+
+def alert(n, ip="10.0.0.1", seconds=0, event="crowdsecurity/ssh-bf"):
+    return {
+        "id": f"a{n}",
+        "event": event,
+        "source_ip": ip,
+        "severity": "Critical",
+        "timestamp": (START + timedelta(seconds=seconds)).isoformat(),
+    }
+
+
+def engine_with(content, rule_id=1):
+    engine = RuleEngine()
+    engine.add(rule_id, content)
+    return engine
+
+
+def test_leaky_rule_fires_when_the_bucket_overflows():
+    engine = engine_with(LEAKY)
+    fired = [engine.match(alert(i)) for i in range(5)]
+    assert fired == [[], [], [], [1], []]
+
+
+def test_bucket_leaks_over_time_and_keys_by_groupby():
+    engine = engine_with(LEAKY)
+    # One alert every 10s leaks as fast as it fills
+    assert all(engine.match(alert(i, seconds=10 * i)) == [] for i in range(10))
+    # Another source has its own bucket
+    assert [engine.match(alert(i, ip="10.0.0.2", seconds=100)) for i in range(4)][-1] == [1]
+
+
+def test_blackhole_silences_the_key_after_firing():
+    engine = engine_with(LEAKY)
+    for i in range(4):
+        engine.match(alert(i))
+    assert [engine.match(alert(10 + i, seconds=1)) for i in range(8)] == [[]] * 8
+    assert [engine.match(alert(20 + i, seconds=120)) for i in range(4)][-1] == [1]
+
+
+def test_filter_must_match():
+    engine = engine_with(LEAKY)
+    assert all(engine.match(alert(i, ip="192.168.0.1")) == [] for i in range(10))
+
+
+def test_hub_scenario_follows_its_name_as_a_trigger():
+    engine = engine_with("""
+type: leaky
+name: crowdsecurity/ssh-bf
+filter: evt.Meta.log_type == 'ssh_failed-auth'
+groupby: evt.Meta.source_ip
+capacity: 5
+leakspeed: 10s
+""")
+    rule = engine._rules[1][0]
+    assert rule.fallback
+    # Each stored alert is already the scenario's overflow
+    assert engine.match(alert(0)) == [1]
+    assert engine.match(alert(1)) == [1]
+    assert engine.match(alert(2, event="crowdsecurity/http-probing")) == []
+
+
+@pytest.mark.parametrize("content", [
+    "type: leaky\nfilter: evt.Meta.source_ip == '1.2.3.4'\ncapacity: 0\nleakspeed: 1s",
+    "filter: evt.Meta.log_type == 'x'",
+    "type: bogus\nname: x",
+    "filter: evt.Meta.source_ip ==",
+    "- not\n- a mapping",
+])
+def test_rules_that_cannot_compile_are_rejected(content):
+    with pytest.raises(RuleError):
+        parse_rules(content)
+
+
+def test_resent_alerts_do_not_advance_the_bucket(alert_store):
+    engine = engine_with(LEAKY)
+    rows = [alert(i) for i in range(3)]
+    insert_alerts(alert_store, engine, [dict(r) for r in rows])
+    # The same three alerts again: nothing new, no overflow
+    assert insert_alerts(alert_store, engine, [dict(r) for r in rows]) == []
+    inserted = insert_alerts(alert_store, engine, [alert(3)])
+    assert inserted[0]["rule_ids"] == "1"
+    stored = alert_store.page(["id", "rule_ids"], {}, None, False, 10)
+    assert {r["id"]: r["rule_ids"] for r in stored} == {"a0": None, "a1": None, "a2": None, "a3": "1"}
+
+
+def test_rule_ids_write_failure_still_returns_the_inserted_rows(alert_store, monkeypatch):
+    engine = engine_with("name: any\nfilter: evt.Meta.source_ip startsWith '10.'")
+
+    def broken(rows):
+        raise ConnectionError("store down")
+
+    monkeypatch.setattr(alert_store, "set_rule_ids", broken)
+    inserted = insert_alerts(alert_store, engine, [alert(0)])
+    assert [(r["id"], r["rule_ids"]) for r in inserted] == [("a0", "1")]
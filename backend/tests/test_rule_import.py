@@ -0,0 +1,79 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from rule_engine import RuleEngine
+from rule_import import ArchiveError, import_rules
+from rule_search import RuleIndex
+
+SSH = b"name: local/ssh\nfilter: alert.scenario == 'crowdsecurity/ssh-bf'\n"
+HTTP = b"name: local/http\ndescription: web probing\nfilter: alert.scenario startsWith 'crowdsecurity/http'\n"
+
+
+def zip_of(files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def tar_of(files):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as t:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+
+def statuses(result):
+    return {e["file"]: e["status"] for e in result["report"]}
+
+
+@pytest.mark.parametrize("pack", [zip_of, tar_of])
+def test_pack_is_validated_and_deduplicated(rule_store, pack):
+    engine, index = RuleEngine(), RuleIndex()
+    result = import_rules(rule_store, engine, pack({
+        "scenarios/ssh.yaml": SSH,
+        "scenarios/http.yml": HTTP,
+        "scenarios/ssh-copy.yaml": SSH,
+        "scenarios/broken.yaml": b"filter: evt.Meta.source_ip ==",
+        "README.md": b"# pack",
+        "scenarios/.hidden.yaml": SSH,
+    }), max_file_bytes=1024, index=index)
+    assert statuses(result) == {
+        "scenarios/ssh.yaml": "created",
+        "scenarios/http.yml": "created",
+        "scenarios/ssh-copy.yaml": "duplicate",
+        "scenarios/broken.yaml": "invalid",
+        "README.md": "skipped",
+        "scenarios/.hidden.yaml": "skipped",
+    }
+    by_file = {e["file"]: e for e in result["report"]}
+    assert by_file["scenarios/ssh-copy.yaml"]["id"] == by_file["scenarios/ssh.yaml"]["id"]
+    assert len(rule_store.all()) == 2
+    assert len(engine) == 2
+    assert index.search("web")[0] == 1
+
+
+def test_reimport_creates_nothing(rule_store):
+    import_rules(rule_store, RuleEngine(), zip_of({"a.yaml": SSH}), max_file_bytes=1024)
+    result = import_rules(rule_store, RuleEngine(), zip_of({"b.yaml": SSH, "c.yaml": HTTP}), max_file_bytes=1024)
+    assert statuses(result) == {"b.yaml": "duplicate", "c.yaml": "created"}
+    assert len(rule_store.all()) == 2
+
+
+def test_oversized_member_is_skipped(rule_store):
+    result = import_rules(rule_store, RuleEngine(), zip_of({"big.yaml": SSH + b"#" * 100}), max_file_bytes=64)
+    assert result["report"][0]["status"] == "skipped"
+
+
+def test_not_an_archive_is_rejected(rule_store):
+    with pytest.raises(ArchiveError):
+        import_rules(rule_store, RuleEngine(), io.BytesIO(b"plain text"), max_file_bytes=1024)
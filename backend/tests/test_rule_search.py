@@ -0,0 +1,53 @@
+from rule_search import RuleIndex, parse_query
+
+
+def rule(rule_id, name, description="", tags="", content=""):
+    return {"id": rule_id, "name": name, "description": description, "tags": tags, "content": content}
+
+
+def ids(result):
+    return [r["id"] for r in result[1]]
+
+
+def index_of(*rows):
+    index = RuleIndex()
+    index.load(rows)
+    return index
+
+
+def test_parse_query():
+    assert parse_query("ssh brute* tag:Linux") == (["ssh"], ["brute"], ["linux"])
+
+
+def test_every_term_must_match_and_name_ranks_first():
+    index = index_of(
+        rule(1, "ssh bruteforce", tags="ssh"),
+        rule(2, "http probing", description="ssh mention", content="bruteforce"),
+        rule(3, "http crawl"),
+    )
+    assert ids(index.search("ssh bruteforce")) == [1, 2]
+    assert index.search("ssh crawl") == (0, [])
+
+
+def test_prefix_matches_every_term_it_expands_to():
+    index = index_of(*(rule(i, f"s{i:03d}") for i in range(150)), rule(999, "other"))
+    total, results = index.search("s*", limit=10)
+    assert total == 150
+    assert len(results) == 10
+    assert index.search("s14*")[0] == 10
+
+
+def test_tags_filter_and_newest_first_without_words():
+    index = index_of(rule(1, "a", tags="ssh, linux"), rule(2, "b", tags="ssh"), rule(3, "c", tags="http"))
+    assert ids(index.search(tags=["ssh"])) == [2, 1]
+    assert ids(index.search("tag:ssh tag:linux")) == [1]
+    assert ids(index.search("a", tags=["http"])) == []
+
+
+def test_paging_and_reindexing():
+    index = index_of(*(rule(i, "ssh") for i in range(5)))
+    assert ids(index.search("ssh", limit=2, offset=2)) == [2, 1]
+    index.add(rule(0, "http"))
+    index.remove(1)
+    assert index.search("ssh")[0] == 3
+    assert ids(index.search("http")) == [0]
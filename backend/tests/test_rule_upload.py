@@ -0,0 +1,61 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.rules as rules_router
+
+RULE = "name: local/ssh\nfilter: alert.scenario == 'crowdsecurity/ssh-bf'\n"
+
+
+@pytest.fixture
+def client(rule_store):
+    app = FastAPI()
+    app.include_router(rules_router.router)
+    app.state.rule_store = rule_store
+    return TestClient(app)
+
+
+def upload(client, content, name="ssh"):
+    return client.post("/rules/upload", data={"name": name}, files={"file": ("rule.yaml", content)})
+
+
+def test_identical_content_is_stored_once(client, rule_store):
+    first = upload(client, RULE).json()
+    again = upload(client, RULE, name="copy").json()
+    assert first["status"] == "success"
+    assert again["status"] == "duplicate"
+    assert again["id"] == first["id"]
+    assert again["content_hash"] == first["content_hash"]
+    assert len(rule_store.all()) == 1
+
+
+def test_content_field_dedupes_against_file_uploads(client):
+    first = upload(client, RULE).json()
+    again = client.post("/rules/upload", data={"name": "inline", "content": RULE}).json()
+    assert again["status"] == "duplicate"
+    assert again["id"] == first["id"]
+
+
+def test_oversized_upload_is_413(client, monkeypatch, rule_store):
+    monkeypatch.setattr(rules_router, "RULES_UPLOAD_CHUNK", 4096)
+    response = client.post(
+        "/rules/upload", data={"name": "big"},
+        files={"file": ("rule.yaml", RULE + "#" * rules_router.RULES_MAX_UPLOAD_BYTES)},
+    )
+    assert response.status_code == 413
+    assert rule_store.all() == []
+
+
+def test_invalid_rule_is_422(client, rule_store):
+    response = upload(client, "filter: evt.Meta.source_ip ==")
+    assert response.status_code == 422
+    assert rule_store.all() == []
+
+
+def test_store_insert_is_idempotent_per_hash(rule_store):
+    row = {"name": "a", "description": None, "tags": None, "content": RULE,
+           "content_hash": "h1", "created_at": "2026-10-18T00:00:00Z"}
+    saved, created = rule_store.insert(dict(row))
+    again, created_again = rule_store.insert({**row, "name": "b"})
+    assert (created, created_again) == (True, False)
+    assert again["id"] == saved["id"]
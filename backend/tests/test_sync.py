@@ -0,0 +1,116 @@
+import asyncio
+import importlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sync_cursor import SyncCursor, lapi_duration, normalize_ts, parse_ts
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+@pytest.fixture
+def sync(tmp_path, monkeypatch):
+    # The module sets up its log file under the working directory on import
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("crowdsec_sync")
+
+
+class FakeLAPI:
+    """GET /v1/alerts over a list of alerts, with LAPI's filter semantics."""
+
+    def __init__(self, alerts):
+        self.alerts = alerts
+        self.calls = []
+
+    async def __call__(self, since=None, created_before=None, limit=None):
+        self.calls.append({"since": since, "created_before": created_before, "limit": limit})
+        now = datetime.now(timezone.utc)
+        rows = self.alerts
+        if since:
+            rows = [a for a in rows if parse_ts(a["started_at"]) >= now - _seconds(since)]
+        if created_before:
+            rows = [a for a in rows if parse_ts(a["created_at"]) <= now - _seconds(created_before)]
+        rows = sorted(rows, key=lambda a: (a["created_at"], a["id"]), reverse=True)
+        return rows[:limit] if limit else rows
+
+
+def _seconds(duration):
+    return timedelta(seconds=int(duration[:-1]))
+
+
+def lapi_alert(alert_id, created_ago, started_before_created=0):
+    created = NOW - timedelta(seconds=created_ago)
+    return {
+        "id": alert_id,
+        "created_at": created.isoformat(),
+        "started_at": (created - timedelta(seconds=started_before_created)).isoformat(),
+    }
+
+
+def test_parse_and_normalize_timestamps():
+    assert parse_ts("2026-10-18T12:00:00.123456789Z") == datetime(2026, 10, 18, 12, 0, 0, 123456, timezone.utc)
+    assert normalize_ts("2026-10-18T14:00:00+02:00") == "2026-10-18T12:00:00.000000Z"
+    assert normalize_ts("2026-10-18T12:00:00Z") < normalize_ts("2026-10-18T12:00:00.5Z")
+    assert normalize_ts("garbage") == "garbage"
+
+
+def test_lapi_duration_covers_the_timestamp():
+    ts = datetime.now(timezone.utc) - timedelta(seconds=10.5)
+    assert lapi_duration(ts) == "11s"
+    assert lapi_duration(ts, round_up=False) == "10s"
+    assert lapi_duration(ts, slack=30) == "41s"
+
+
+def test_cursor_advances_and_survives_a_restart(tmp_path):
+    path = str(tmp_path / "state" / "cursor.json")
+    cursor = SyncCursor(path)
+    assert cursor.advance([lapi_alert(1, 30), lapi_alert(3, 10), lapi_alert(2, 10)])
+    assert not cursor.advance([lapi_alert(1, 30)])
+    cursor.save()
+    restored = SyncCursor.load(path)
+    assert (restored.created_at, restored.alert_id) == (NOW - timedelta(seconds=10), 3)
+
+
+def test_corrupt_cursor_starts_over(tmp_path):
+    path = tmp_path / "cursor.json"
+    path.write_text("{not json")
+    assert SyncCursor.load(str(path)).created_at is None
+
+
+def test_pages_back_until_the_cursor(sync, monkeypatch):
+    alerts = [lapi_alert(i, 2000 - i) for i in range(2000)]
+    lapi = FakeLAPI(alerts)
+    monkeypatch.setattr(sync, "fetch_alerts", lapi)
+    monkeypatch.setattr(sync, "SYNC_PAGE_LIMIT", 100)
+    cursor = SyncCursor("unused", parse_ts(alerts[1500]["created_at"]), 1500)
+
+    fetched = {a["id"] for a in asyncio.run(sync.fetch_new_alerts(cursor))}
+    assert set(range(1501, 2000)) <= fetched
+    # Stops soon after passing the cursor instead of walking the whole window
+    assert len(lapi.calls) <= 7
+    assert all(call["created_before"] is not None for call in lapi.calls[1:])
+
+
+def test_alert_whose_bucket_started_long_before_is_fetched(sync, monkeypatch):
+    # A slow scenario: its bucket started an hour before the alert was created
+    alerts = [lapi_alert(1, 100), lapi_alert(2, 5, started_before_created=3600)]
+    monkeypatch.setattr(sync, "fetch_alerts", FakeLAPI(alerts))
+    cursor = SyncCursor("unused", parse_ts(alerts[0]["created_at"]), 1)
+    assert 2 in {a["id"] for a in asyncio.run(sync.fetch_new_alerts(cursor))}
+
+
+def test_burst_within_one_second_is_read_whole(sync, monkeypatch):
+    alerts = [lapi_alert(i, 50) for i in range(250)] + [lapi_alert(1000, 200)]
+    monkeypatch.setattr(sync, "fetch_alerts", FakeLAPI(alerts))
+    monkeypatch.setattr(sync, "SYNC_PAGE_LIMIT", 100)
+    cursor = SyncCursor("unused", parse_ts(alerts[-1]["created_at"]), 1000)
+    assert {a["id"] for a in asyncio.run(sync.fetch_new_alerts(cursor))} >= set(range(250))
+
+
+def test_failed_page_fails_the_round(sync, monkeypatch):
+    async def down(**kwargs):
+        return None
+
+    monkeypatch.setattr(sync, "fetch_alerts", down)
+    assert asyncio.run(sync.fetch_new_alerts(SyncCursor("unused"))) is None
@@ -4,14 +4,14 @@ import { useAlerts } from '@/hooks/useAlerts';
 const SimpleThreatMap = () => {
   const { alerts } = useAlerts();
 
-  // Convert IP to approximate coordinates (demo/hash method)
-  const getCoordinatesFromIP = (ip: string) => {
-    const parts = ip.split('.');
-    if (parts.length !== 4) return { x: Math.random() * 100, y: Math.random() * 100 };
-    const hashX = (parseInt(parts[0]) * 3.14159 + parseInt(parts[1]) * 2.71828) % 100;
-    const hashY = (parseInt(parts[2]) * 1.41421 + parseInt(parts[3]) * 1.73205) % 100;
-    return { x: hashX, y: hashY };
-  };
+  // Equirectangular projection of the GeoIP coordinates stored by the backend
+  const located = alerts.filter(
+    (alert) => alert.latitude != null && alert.longitude != null
+  );
+  const toPosition = (lat: number, lng: number) => ({
+    x: ((lng + 180) / 360) * 100,
+    y: ((90 - lat) / 180) * 100,
+  });
 
   return (
     <Card className="bg-card border-border">
@@ -23,8 +23,8 @@ const SimpleThreatMap = () => {
           <div className="absolute inset-0 bg-gradient-to-r from-secondary/30 to-secondary/10" />
           
           <div className="relative w-full h-full">
-            {alerts.slice(0, 10).map((alert) => {
-              const coords = getCoordinatesFromIP(alert.source_ip);
+            {located.slice(0, 10).map((alert) => {
+              const coords = toPosition(alert.latitude!, alert.longitude!);
               return (
                 <div
                   key={alert.id}
@@ -34,14 +34,14 @@ const SimpleThreatMap = () => {
                     top: `${coords.y}%`,
                     boxShadow: '0 0 10px rgba(239, 68, 68, 0.6)'
                   }}
-                  title={`${alert.event} from ${alert.source_ip}`}
+                  title={`${alert.event} from ${alert.source_ip}${alert.country ? ` (${alert.city ? `${alert.city}, ` : ''}${alert.country})` : ''}`}
                 />
               );
             })}
           </div>
           
           <div className="absolute bottom-4 left-4 text-xs text-muted-foreground">
-            Showing {Math.min(alerts.length, 10)} active threats
+            Showing {Math.min(located.length, 10)} active threats
           </div>
         </div>
       </CardContent>
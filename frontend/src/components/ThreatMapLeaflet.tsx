@@ -12,52 +12,45 @@ interface ThreatLocation {
   intensity: number;
   ip: string;
   event: string;
+  severity: string;
   timestamp: string;
+  place: string;
 }
 
 const ThreatMapLeaflet = () => {
   const { alerts } = useAlerts();
   const [threats, setThreats] = useState<ThreatLocation[]>([]);
 
-  const getCoordinatesFromIP = (ip: string): { lat: number; lng: number } => {
-    const ipParts = ip.split('.');
-    if (ipParts.length !== 4) return { lat: 0, lng: 0 };
-
-    const hash1 = parseInt(ipParts[0]) * 3.14159 + parseInt(ipParts[1]) * 2.71828;
-    const hash2 = parseInt(ipParts[2]) * 1.41421 + parseInt(ipParts[3]) * 1.73205;
-
-    const lat = ((hash1 % 160) - 80); // -80 to +80
-    const lng = ((hash2 % 360) - 180); // -180 to +180
-
-    return { lat, lng };
-  };
-
   useEffect(() => {
     if (alerts && alerts.length > 0) {
-      const threatLocations: ThreatLocation[] = alerts.slice(0, 50).map(alert => {
-        const coords = getCoordinatesFromIP(alert.source_ip);
-        return {
+      // Only alerts the backend could geolocate (GeoIP enrichment at ingest)
+      const threatLocations: ThreatLocation[] = alerts
+        .filter(alert => alert.latitude != null && alert.longitude != null)
+        .slice(0, 50)
+        .map(alert => ({
           id: alert.id.toString(),
-          lat: coords.lat,
-          lng: coords.lng,
+          lat: alert.latitude!,
+          lng: alert.longitude!,
           intensity: Math.random() * 0.8 + 0.2,
           ip: alert.source_ip,
           event: alert.event,
+          severity: alert.severity,
           timestamp: alert.timestamp,
-        };
-      });
+          place: [alert.city, alert.country].filter(Boolean).join(', '),
+        }));
       setThreats(threatLocations);
     }
   }, [alerts]);
 
   const mapCenter: LatLngExpression = [20, 0];
 
-  const getSeverityColor = (event: string) => {
-    const lower = event.toLowerCase();
-    if (lower.includes('ssh') || lower.includes('bruteforce')) return '#dc2626';
-    if (lower.includes('ddos') || lower.includes('dos')) return '#7c2d12';
-    if (lower.includes('scan') || lower.includes('exploit')) return '#ea580c';
-    return '#eab308';
+  const getSeverityColor = (severity: string) => {
+    switch (severity) {
+      case 'Critical': return '#dc2626';
+      case 'Ddos': return '#7c2d12';
+      case 'High': return '#ea580c';
+      default: return '#eab308';
+    }
   };
 
   return (
@@ -86,8 +79,8 @@ const ThreatMapLeaflet = () => {
                 key={threat.id}
                 center={[threat.lat, threat.lng] as LatLngExpression}
                 pathOptions={{
-                  color: getSeverityColor(threat.event),
-                  fillColor: getSeverityColor(threat.event),
+                  color: getSeverityColor(threat.severity),
+                  fillColor: getSeverityColor(threat.severity),
                   fillOpacity: 0.7,
                   weight: 2,
                 }}
@@ -97,6 +90,9 @@ const ThreatMapLeaflet = () => {
                   <div className="text-sm space-y-1">
                     <div className="font-semibold text-foreground">{threat.event}</div>
                     <div className="text-muted-foreground">Source IP: {threat.ip}</div>
+                    {threat.place && (
+                      <div className="text-xs text-muted-foreground">{threat.place}</div>
+                    )}
                     <div className="text-xs text-muted-foreground">
                       Location: {threat.lat.toFixed(2)}, {threat.lng.toFixed(2)}
                     </div>
@@ -8,6 +8,11 @@ export interface Alert {
   source_ip: string;
   timestamp: string;
   severity: string;
+  country?: string | null;
+  city?: string | null;
+  latitude?: number | null;
+  longitude?: number | null;
+  asn?: number | null;
 }
 
 export const useAlerts = () => {
@@ -15,15 +20,6 @@ export const useAlerts = () => {
   const [loading, setLoading] = useState(true);
   const { toast } = useToast();
 
-  const getSeverityFromEvent = (event: string): string => {
-    const eventLower = event.toLowerCase();
-    if (eventLower.includes('ssh') || eventLower.includes('bruteforce')) return 'Critical';
-    if (eventLower.includes('ddos') || eventLower.includes('dos')) return 'Ddos';
-    if (eventLower.includes('scan') || eventLower.includes('exploit')) return 'High';
-    if (eventLower.includes('suspicious')) return 'Medium';
-    return 'Low';
-  };
-
   const fetchAlerts = async () => {
     setLoading(true);
     try {
@@ -42,7 +38,13 @@ export const useAlerts = () => {
         event: alert.event,
         source_ip: alert.source_ip,
         timestamp: new Date(alert.timestamp).toLocaleString(),
-        severity: getSeverityFromEvent(alert.event)
+        // Classified by the backend at ingest
+        severity: alert.severity,
+        country: alert.country,
+        city: alert.city,
+        latitude: alert.latitude,
+        longitude: alert.longitude,
+        asn: alert.asn
       }));
 
       setAlerts(transformedAlerts);
@@ -72,7 +74,12 @@ export const useAlerts = () => {
             event: payload.new.event,
             source_ip: payload.new.source_ip,
             timestamp: new Date(payload.new.timestamp).toLocaleString(),
-            severity: getSeverityFromEvent(payload.new.event)
+            severity: payload.new.severity,
+            country: payload.new.country,
+            city: payload.new.city,
+            latitude: payload.new.latitude,
+            longitude: payload.new.longitude,
+            asn: payload.new.asn
           };
           setAlerts(prev => [newAlert, ...prev.slice(0, 99)]);
           toast({
@@ -18,17 +18,35 @@ export type Database = {
           id: number;
           event: string;
           source_ip: string;
+          severity: string;
           timestamp: string;
+          country: string | null;
+          city: string | null;
+          latitude: number | null;
+          longitude: number | null;
+          asn: number | null;
         };
         Insert: {
           event: string;
           source_ip: string;
+          severity?: string;
           timestamp?: string;
+          country?: string | null;
+          city?: string | null;
+          latitude?: number | null;
+          longitude?: number | null;
+          asn?: number | null;
         };
         Update: {
           event?: string;
           source_ip?: string;
+          severity?: string;
           timestamp?: string;
+          country?: string | null;
+          city?: string | null;
+          latitude?: number | null;
+          longitude?: number | null;
+          asn?: number | null;
         };
       };
     };